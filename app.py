@@ -1,14 +1,23 @@
+import io
+import math
 import os
-import pickle
+import time
+import uuid
 import streamlit as st
 from streamlit_option_menu import option_menu
-import numpy as np
+from arogyam import metrics
+from arogyam.registry import MODULES, by_title, get_model
+from arogyam.store import open_store
+from arogyam.sync import start_sync
+from arogyam.trends import get_tracker, vitals_from
+from arogyam.triage import ZONE_AMBER, ZONE_RED, assess
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="AROGYAM", layout="wide", page_icon="🛡️")
 
 # --- TACTICAL STYLING (Professional Animations & Dark Theme) ---
-st.markdown("""
+with metrics.stage('css'):
+    st.markdown("""
     <style>
     .stApp { background-color: #0E1117; color: #E2E8F0; }
     h1, h2, h3 { color: #00E5FF; text-transform: uppercase; letter-spacing: 1px; }
@@ -47,8 +56,15 @@ st.markdown("""
 
 # --- LOAD ASSETS ---
 working_dir = os.path.dirname(os.path.abspath(__file__))
-model = pickle.load(open(f'{working_dir}/heart_disease_model.sav', 'rb'))
-scaler = pickle.load(open(f'{working_dir}/scaler.pkl', 'rb'))
+
+# Loaded on first use and shared by every session through the registry's bounded model cache.
+def get_engine():
+    return get_model('heart', working_dir)
+
+# Serves $AROGYAM_METRICS_PORT and/or rewrites $AROGYAM_METRICS_FILE; once per process.
+metrics.start_exporter()
+# Drains the assessment outbox whenever the link is up, from process start; no-op unless $AROGYAM_SYNC_URL is set.
+start_sync(open_store())
 
 # --- SESSION STATE MANAGEMENT ---
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
@@ -56,7 +72,7 @@ if 'page_step' not in st.session_state: st.session_state['page_step'] = 1
 
 # Permanent State initialization
 default_vals = {
-    'age': 30, 'sex': None, 's_bp': 120, 'd_bp': 80, 'pulse': 72, 'resp': 16, 'spo2': 98,
+    'subject_id': '', 'age': 30, 'sex': None, 's_bp': 120, 'd_bp': 80, 'pulse': 72, 'resp': 16, 'spo2': 98,
     'cp_yn': None, 'cp_type': None, 'rad': None, 'sweat': None, 'nausea': None, 'doe': None, 'syncope': None,
     'comorb': None, 'fam_hx': None, 'per_hx': None, 'ecg_opt': False, 'ecg_val': None, 'hb_opt': False, 'hb_val': 14.0, 'trop_val': None
 }
@@ -111,6 +127,123 @@ def login_page():
                 else:
                     st.error("INVALID CREDENTIALS")
 
+# --- BULK ROSTER TRIAGE ---
+def roster_page():
+    st.header("Bulk Roster Triage")
+    st.caption("Upload a CSV or Parquet roster with one row per subject. Column names and values match the assessment form "
+               "(age, sex, s_bp, d_bp, pulse, resp, spo2, cp_yn, cp_type, rad, sweat, nausea, doe, syncope, comorb, fam_hx, per_hx, "
+               "ecg_val, hb_val, trop_val) plus an optional subject_id.")
+    roster = st.file_uploader("UNIT ROSTER", type=["csv", "parquet"])
+    if roster is None:
+        return
+    # pandas is only needed here, so it is not imported on every cold start.
+    from arogyam.roster import score_roster
+
+    # Score each upload once: widget clicks (including DOWNLOAD) rerun this page.
+    cached = st.session_state.get('roster_result')
+    if cached is not None and cached[0] == roster.file_id:
+        counts, results = cached[1:]
+    else:
+        out = io.StringIO()
+        with st.spinner("Scoring roster..."):
+            try:
+                counts = score_roster(roster, out, engine=get_engine())
+            except (KeyError, ValueError, ImportError) as e:
+                st.error(f"⚠️ Could not score roster: {e}")
+                return
+        results = out.getvalue()
+        st.session_state['roster_result'] = (roster.file_id, counts, results)
+
+    z1, z2, z3 = st.columns(3)
+    z1.metric("🔴 ZONE RED", counts["RED"])
+    z2.metric("🟡 ZONE AMBER", counts["AMBER"])
+    z3.metric("🟢 ZONE GREEN", counts["GREEN"])
+    if counts["INVALID"]:
+        st.warning(f"⚠️ {counts['INVALID']} subject(s) not scored: mandatory fields missing (see the 'missing' column).")
+    st.download_button("DOWNLOAD TRIAGE RESULTS", results, file_name=f"triage_{os.path.splitext(roster.name)[0]}.csv", mime="text/csv", type="primary")
+
+# --- FORM OPTIONS ---
+opts_yn = ["No", "Yes"]
+opts_cp = ["Tight", "Heavy", "Crushing"]
+opts_comorb = ["None", "Hypertension", "Diabetes", "Dyslipidemia"]
+opts_trop = ["Negative", "Positive"]
+opts_ecg = ["Normal", "ST Elevation", "ST Depression", "T Wave Inversion", "LBBB", "Pathological Q Waves"]
+
+# --- PAGE 1: CORE VITALS ---
+@st.fragment
+def core_vitals_page():
+    st.header("Core Vitals")
+    st.caption("Fields marked with * are mandatory. Hover over the ? for clinical information.")
+    
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.session_state['subject_id'] = st.text_input("Subject ID (Army No.)", st.session_state['subject_id'], help="Links this assessment to the subject's earlier results.").strip()
+        st.session_state['age'] = st.number_input("Age *", 18, 90, st.session_state['age'], help=tt_lib['age'])
+        st.session_state['sex'] = st.radio("Sex *", ["Male", "Female"], index=get_idx(["Male", "Female"], st.session_state['sex']), horizontal=True, help=tt_lib['sex'])
+        
+        bp1, bp2 = st.columns(2)
+        with bp1:
+            st.session_state['s_bp'] = st.number_input("Systolic BP *", 60, 240, st.session_state['s_bp'], help=tt_lib['s_bp'])
+        with bp2:
+            st.session_state['d_bp'] = st.number_input("Diastolic BP *", 40, 150, st.session_state['d_bp'], help=tt_lib['d_bp'])
+        
+        st.session_state['pulse'] = st.number_input("Pulse Rate (BPM) *", 40, 220, st.session_state['pulse'], help=tt_lib['pulse'])
+        st.session_state['resp'] = st.number_input("Resp Rate (/min) *", 8, 50, st.session_state['resp'], help=tt_lib['resp'])
+
+    with col_b:
+        st.markdown(f"<div style='text-align: center; font-weight: bold;' title='{tt_lib['spo2']}'>SpO2 Levels (%) <span class='req'>*</span> ❓</div>", unsafe_allow_html=True)
+        st.markdown("<div class='spo2-container'><h3>🫧 O₂</h3></div>", unsafe_allow_html=True)
+        st.session_state['spo2'] = st.select_slider("spo2_hidden", options=list(range(60, 101)), value=st.session_state['spo2'], label_visibility="collapsed")
+        st.write(f"<h1 style='text-align:center;'>{st.session_state['spo2']}%</h1>", unsafe_allow_html=True)
+
+# --- PAGE 2: CLINICAL FACTORS ---
+@st.fragment
+def clinical_factors_page():
+    st.header("Clinical Factors")
+    st.caption("Hover over the ? for clinical information.")
+    
+    st.session_state['cp_yn'] = st.radio("Chest Pain Present? *", opts_yn, index=get_idx(opts_yn, st.session_state['cp_yn']), horizontal=True, help=tt_lib['cp_yn'])
+    st.session_state['cp_type'] = st.selectbox("Type of Pain *", opts_cp, index=get_idx(opts_cp, st.session_state['cp_type']) if st.session_state['cp_yn'] == "Yes" else None, disabled=(st.session_state['cp_yn'] != "Yes"), help=tt_lib['cp_type'])
+    
+    c1, c2 = st.columns(2)
+    with c1:
+        st.session_state['rad'] = st.radio("Radiation of Pain *", opts_yn, index=get_idx(opts_yn, st.session_state['rad']), horizontal=True, help=tt_lib['rad'])
+        st.session_state['sweat'] = st.radio("Sweating (Diaphoresis) *", opts_yn, index=get_idx(opts_yn, st.session_state['sweat']), horizontal=True, help=tt_lib['sweat'])
+        st.session_state['nausea'] = st.radio("Nausea / Vomiting *", opts_yn, index=get_idx(opts_yn, st.session_state['nausea']), horizontal=True, help=tt_lib['nausea'])
+    with c2:
+        st.session_state['doe'] = st.radio("Dyspnoea on Exertion (DOE) *", opts_yn, index=get_idx(opts_yn, st.session_state['doe']), horizontal=True, help=tt_lib['doe'])
+        st.session_state['syncope'] = st.radio("Syncope (Fainting) *", opts_yn, index=get_idx(opts_yn, st.session_state['syncope']), horizontal=True, help=tt_lib['syncope'])
+
+# --- PAGE 3: HISTORY & DIAGNOSTICS ---
+@st.fragment
+def history_page():
+    st.header("History & Diagnostics")
+    c1, c2 = st.columns(2)
+    
+    with c1:
+        with st.container(border=True):
+            st.subheader("History")
+            st.session_state['comorb'] = st.selectbox("Primary Comorbidity *", opts_comorb, index=get_idx(opts_comorb, st.session_state['comorb']), help=tt_lib['comorb'])
+            st.session_state['fam_hx'] = st.radio("Family History of CVD *", opts_yn, index=get_idx(opts_yn, st.session_state['fam_hx']), horizontal=True, help=tt_lib['fam_hx'])
+            st.session_state['per_hx'] = st.radio("Personal History of CVD *", opts_yn, index=get_idx(opts_yn, st.session_state['per_hx']), horizontal=True, help=tt_lib['per_hx'])
+    
+    with c2:
+        with st.container(border=True):
+            st.subheader("Field Diagnostics")
+            st.session_state['ecg_opt'] = st.toggle("Is ECG Available?", value=st.session_state['ecg_opt'])
+            if st.session_state['ecg_opt']:
+                st.session_state['ecg_val'] = st.selectbox("ECG Finding *", opts_ecg, index=get_idx(opts_ecg, st.session_state.get('ecg_val')), help=tt_lib['ecg_val'])
+            else:
+                st.session_state['ecg_val'] = "Normal"
+            
+            st.session_state['hb_opt'] = st.toggle("Is Hb Test Available?", value=st.session_state['hb_opt'])
+            if st.session_state['hb_opt']:
+                st.session_state['hb_val'] = st.slider("Hemoglobin (g/dL) *", 5.0, 25.0, st.session_state['hb_val'], help=tt_lib['hb_val'])
+            else:
+                st.session_state['hb_val'] = 14.0
+
+            st.session_state['trop_val'] = st.radio("Troponin T (Rapid Kit) *", opts_trop, index=get_idx(opts_trop, st.session_state['trop_val']), horizontal=True, help=tt_lib['trop_val'])
+
 # --- MAIN APPLICATION ---
 def main_app():
     with st.sidebar:
@@ -118,7 +251,8 @@ def main_app():
         st.markdown("<div class='brand-sub'>BY BARHE CHALO 🩺</div>", unsafe_allow_html=True)
         st.markdown("---")
         
-        selected = option_menu("Diagnosis", ["Heart Disease", "Brain Stroke"], icons=["heart-pulse", "lightning-charge"], menu_icon="cast", default_index=0)
+        selected = option_menu("Diagnosis", [m.title for m in MODULES.values()], icons=[m.icon for m in MODULES.values()], menu_icon="cast", default_index=0)
+        bulk_mode = st.toggle("Bulk Roster Triage", key='bulk_mode')
         
         st.write("<br><br><br><br>", unsafe_allow_html=True)
         _, c_btn, _ = st.columns([1, 4, 1])
@@ -127,187 +261,112 @@ def main_app():
                 st.session_state.clear()
                 st.rerun()
 
-    if selected == "Brain Stroke (WIP)":
-        st.title("🧠 Brain Stroke Prediction")
+    module = by_title(selected)
+    if not module.ready:
+        st.title(f"🧠 {module.title} Prediction")
         st.info("Module under development. Awaiting clinical parameters.")
         return
 
+    if bulk_mode:
+        roster_page()
+        return
+
     st.markdown(f"### PAGE {st.session_state['page_step']} OF 4")
     cols = st.columns(4)
     for i in range(4): cols[i].progress(100 if st.session_state['page_step'] > i else (0 if st.session_state['page_step'] <= i else 50))
     st.markdown("<hr style='margin-top: 5px; margin-bottom: 20px;'>", unsafe_allow_html=True)
 
-    opts_yn = ["No", "Yes"]
-    opts_cp = ["Tight", "Heavy", "Crushing"]
-    opts_comorb = ["None", "Hypertension", "Diabetes", "Dyslipidemia"]
-    opts_trop = ["Negative", "Positive"]
-    opts_ecg = ["Normal", "ST Elevation", "ST Depression", "T Wave Inversion", "LBBB", "Pathological Q Waves"]
-
-    # --- PAGE 1: CORE VITALS ---
+    # Each wizard page is a fragment: editing one of its widgets reruns and
+    # re-sends only that page, not the CSS, sidebar, progress bar or navigation.
     if st.session_state['page_step'] == 1:
-        st.header("Core Vitals")
-        st.caption("Fields marked with * are mandatory. Hover over the ? for clinical information.")
-        
-        col_a, col_b = st.columns(2)
-        with col_a:
-            st.session_state['age'] = st.number_input("Age *", 18, 90, st.session_state['age'], help=tt_lib['age'])
-            st.session_state['sex'] = st.radio("Sex *", ["Male", "Female"], index=get_idx(["Male", "Female"], st.session_state['sex']), horizontal=True, help=tt_lib['sex'])
-            
-            bp1, bp2 = st.columns(2)
-            with bp1:
-                st.session_state['s_bp'] = st.number_input("Systolic BP *", 60, 240, st.session_state['s_bp'], help=tt_lib['s_bp'])
-            with bp2:
-                st.session_state['d_bp'] = st.number_input("Diastolic BP *", 40, 150, st.session_state['d_bp'], help=tt_lib['d_bp'])
-            
-            st.session_state['pulse'] = st.number_input("Pulse Rate (BPM) *", 40, 220, st.session_state['pulse'], help=tt_lib['pulse'])
-            st.session_state['resp'] = st.number_input("Resp Rate (/min) *", 8, 50, st.session_state['resp'], help=tt_lib['resp'])
-
-        with col_b:
-            st.markdown(f"<div style='text-align: center; font-weight: bold;' title='{tt_lib['spo2']}'>SpO2 Levels (%) <span class='req'>*</span> ❓</div>", unsafe_allow_html=True)
-            st.markdown("<div class='spo2-container'><h3>🫧 O₂</h3></div>", unsafe_allow_html=True)
-            st.session_state['spo2'] = st.select_slider("spo2_hidden", options=list(range(60, 101)), value=st.session_state['spo2'], label_visibility="collapsed")
-            st.write(f"<h1 style='text-align:center;'>{st.session_state['spo2']}%</h1>", unsafe_allow_html=True)
-
-    # --- PAGE 2: CLINICAL FACTORS ---
+        core_vitals_page()
     elif st.session_state['page_step'] == 2:
-        st.header("Clinical Factors")
-        st.caption("Hover over the ? for clinical information.")
-        
-        st.session_state['cp_yn'] = st.radio("Chest Pain Present? *", opts_yn, index=get_idx(opts_yn, st.session_state['cp_yn']), horizontal=True, help=tt_lib['cp_yn'])
-        st.session_state['cp_type'] = st.selectbox("Type of Pain *", opts_cp, index=get_idx(opts_cp, st.session_state['cp_type']) if st.session_state['cp_yn'] == "Yes" else None, disabled=(st.session_state['cp_yn'] != "Yes"), help=tt_lib['cp_type'])
-        
-        c1, c2 = st.columns(2)
-        with c1:
-            st.session_state['rad'] = st.radio("Radiation of Pain *", opts_yn, index=get_idx(opts_yn, st.session_state['rad']), horizontal=True, help=tt_lib['rad'])
-            st.session_state['sweat'] = st.radio("Sweating (Diaphoresis) *", opts_yn, index=get_idx(opts_yn, st.session_state['sweat']), horizontal=True, help=tt_lib['sweat'])
-            st.session_state['nausea'] = st.radio("Nausea / Vomiting *", opts_yn, index=get_idx(opts_yn, st.session_state['nausea']), horizontal=True, help=tt_lib['nausea'])
-        with c2:
-            st.session_state['doe'] = st.radio("Dyspnoea on Exertion (DOE) *", opts_yn, index=get_idx(opts_yn, st.session_state['doe']), horizontal=True, help=tt_lib['doe'])
-            st.session_state['syncope'] = st.radio("Syncope (Fainting) *", opts_yn, index=get_idx(opts_yn, st.session_state['syncope']), horizontal=True, help=tt_lib['syncope'])
-
-    # --- PAGE 3: HISTORY & DIAGNOSTICS ---
+        clinical_factors_page()
     elif st.session_state['page_step'] == 3:
-        st.header("History & Diagnostics")
-        c1, c2 = st.columns(2)
-        
-        with c1:
-            with st.container(border=True):
-                st.subheader("History")
-                st.session_state['comorb'] = st.selectbox("Primary Comorbidity *", opts_comorb, index=get_idx(opts_comorb, st.session_state['comorb']), help=tt_lib['comorb'])
-                st.session_state['fam_hx'] = st.radio("Family History of CVD *", opts_yn, index=get_idx(opts_yn, st.session_state['fam_hx']), horizontal=True, help=tt_lib['fam_hx'])
-                st.session_state['per_hx'] = st.radio("Personal History of CVD *", opts_yn, index=get_idx(opts_yn, st.session_state['per_hx']), horizontal=True, help=tt_lib['per_hx'])
-        
-        with c2:
-            with st.container(border=True):
-                st.subheader("Field Diagnostics")
-                st.session_state['ecg_opt'] = st.toggle("Is ECG Available?", value=st.session_state['ecg_opt'])
-                if st.session_state['ecg_opt']:
-                    st.session_state['ecg_val'] = st.selectbox("ECG Finding *", opts_ecg, index=get_idx(opts_ecg, st.session_state.get('ecg_val')), help=tt_lib['ecg_val'])
-                else:
-                    st.session_state['ecg_val'] = "Normal"
-                
-                st.session_state['hb_opt'] = st.toggle("Is Hb Test Available?", value=st.session_state['hb_opt'])
-                if st.session_state['hb_opt']:
-                    st.session_state['hb_val'] = st.slider("Hemoglobin (g/dL) *", 5.0, 25.0, st.session_state['hb_val'], help=tt_lib['hb_val'])
-                else:
-                    st.session_state['hb_val'] = 14.0
-
-                st.session_state['trop_val'] = st.radio("Troponin T (Rapid Kit) *", opts_trop, index=get_idx(opts_trop, st.session_state['trop_val']), horizontal=True, help=tt_lib['trop_val'])
+        history_page()
 
     # --- PAGE 4: DETAILED HYBRID DIAGNOSIS ---
     elif st.session_state['page_step'] == 4:
         st.header("Diagnostic Triage Results")
         
-        sex_val = 1 if st.session_state['sex'] == "Male" else 0
-        cp_yn_val = 1 if st.session_state['cp_yn'] == "Yes" else 0
-        cp_map = {"Tight": 0, "Heavy": 1, "Crushing": 2}
-        cp_type_val = cp_map.get(st.session_state['cp_type'], 0) if cp_yn_val == 1 else 0
-        
-        rad_val = 1 if st.session_state['rad'] == "Yes" else 0
-        sweat_val = 1 if st.session_state['sweat'] == "Yes" else 0
-        nau_val = 1 if st.session_state['nausea'] == "Yes" else 0
-        doe_val = 1 if st.session_state['doe'] == "Yes" else 0
-        sync_val = 1 if st.session_state['syncope'] == "Yes" else 0
-        
-        com_map = {"None": 0, "Hypertension": 1, "Diabetes": 2, "Dyslipidemia": 3}
-        fam_val = 1 if st.session_state['fam_hx'] == "Yes" else 0
-        per_val = 1 if st.session_state['per_hx'] == "Yes" else 0
-        
-        ecg_map = {"Normal": 0, "ST Elevation": 1, "ST Depression": 2, "T Wave Inversion": 3, "LBBB": 4, "Pathological Q Waves": 5}
-        ecg_mapped = ecg_map.get(st.session_state['ecg_val'], 0)
-        trop_mapped = 1 if st.session_state['trop_val'] == "Positive" else 0
-
-        features = [
-            st.session_state['age'], sex_val, st.session_state['s_bp'], st.session_state['d_bp'], 
-            st.session_state['pulse'], st.session_state['resp'], st.session_state['spo2'],
-            cp_yn_val, cp_type_val, rad_val, sweat_val, nau_val, doe_val, sync_val,
-            com_map.get(st.session_state['comorb'], 0), fam_val, per_val, ecg_mapped, 
-            st.session_state['hb_val'], trop_mapped
-        ]
-        
-        input_scaled = scaler.transform([features])
-        ml_prediction = model.predict(input_scaled)[0]
-        
-        abnormal_flags = []
-        critical_flags = []
-        
-        if st.session_state['s_bp'] > 160 or st.session_state['d_bp'] > 100: abnormal_flags.append({"name": f"High BP ({st.session_state['s_bp']}/{st.session_state['d_bp']})", "act": "Monitor closely. Keep subject seated. Do not give stimulants (tea/coffee)."})
-        if st.session_state['pulse'] > 120 or st.session_state['pulse'] < 50: abnormal_flags.append({"name": f"Abnormal Pulse ({st.session_state['pulse']} BPM)", "act": "Assess for shock or severe dehydration. Hydrate slowly if conscious."})
-        if st.session_state['spo2'] < 92: abnormal_flags.append({"name": f"Hypoxia (SpO2: {st.session_state['spo2']}%)", "act": "Administer Supplemental Oxygen via mask. Prepare for descent if at high altitude."})
-        if st.session_state['resp'] > 25: abnormal_flags.append({"name": f"Tachypnea (Resp: {st.session_state['resp']}/min)", "act": "Patient is struggling to breathe. Sit them upright. Administer O2."})
-        
-        if st.session_state['fam_hx'] == "Yes": abnormal_flags.append({"name": "Family History of Heart Disease", "act": "Lowers threshold for evacuation. Treat minor symptoms more seriously."})
-        if st.session_state['per_hx'] == "Yes": abnormal_flags.append({"name": "Previous Heart Issues", "act": "Extremely high risk of recurrence. Subject should not do heavy lifting/patrols."})
+        # Pin the model for the rest of this assessment so a hot swap never changes a result under review.
+        if 'engine' not in st.session_state:
+            st.session_state['engine'] = get_model(module.key, working_dir)
+        result = assess(st.session_state, st.session_state['engine'], module=module)
+        features = module.encode(st.session_state)
+        # Page 4 reruns on every click; only persist when the inputs changed. Going back
+        # to correct an input re-runs the same assessment, so its row is replaced, not added.
+        if st.session_state.get('recorded_features') != features:
+            store = open_store()
+            if 'assessment_key' not in st.session_state:
+                st.session_state['assessment_key'] = uuid.uuid4().hex
+                metrics.count('arogyam_assessments_total', zone=result.zone)
+            if st.session_state['subject_id']:
+                st.session_state['trend'] = get_tracker(store).update(st.session_state['subject_id'], time.time(), vitals_from(st.session_state, st.session_state['hb_opt']), key=st.session_state['assessment_key'])
+            store.record(result, features, subject_id=st.session_state['subject_id'], key=st.session_state['assessment_key'])
+            st.session_state['recorded_features'] = features
+        ml_prediction = result.ml_prediction
+        abnormal_flags, critical_flags = result.abnormal_flags, result.critical_flags
         
-        if 18.0 < st.session_state['hb_val'] <= 19.5: abnormal_flags.append({"name": f"Elevated Hemoglobin ({st.session_state['hb_val']} g/dL)", "act": "Blood is thickening. Hydrate heavily. Restrict physical exertion to prevent clotting."})
-        elif st.session_state['hb_val'] > 19.5: critical_flags.append({"name": f"CRITICAL Hemoglobin ({st.session_state['hb_val']} g/dL)", "act": "Severe risk of stroke/thrombosis due to blood sludging. Immediate hydration and CAS EVAC."})
-        elif st.session_state['hb_val'] < 10.0: abnormal_flags.append({"name": f"Low Hemoglobin ({st.session_state['hb_val']} g/dL)", "act": "Anemia. Blood cannot carry enough oxygen. Do not deploy to high altitude."})
-        
-        if st.session_state['nausea'] == "Yes": abnormal_flags.append({"name": "Nausea / Vomiting", "act": "Ensure airway is clear. Do not force feed."})
-        if st.session_state['doe'] == "Yes": abnormal_flags.append({"name": "Dyspnoea on Exertion", "act": "Strict bed rest. Administer O2. Check for HAPE."})
-        
-        if st.session_state['cp_yn'] == "Yes": critical_flags.append({"name": f"Active Chest Pain ({st.session_state.get('cp_type', '')})", "act": "Assume Heart Attack. Administer 300mg chewable Aspirin immediately (if not allergic). Give O2."})
-        if st.session_state['rad'] == "Yes": critical_flags.append({"name": "Radiating Pain", "act": "Classic Ischemia. Administer Sorbitrate/Nitroglycerin under tongue if BP > 100."})
-        if st.session_state['sweat'] == "Yes": critical_flags.append({"name": "Diaphoresis (Cold Sweats)", "act": "Subject is in clinical shock. Elevate legs slightly, keep warm."})
-        if st.session_state['syncope'] == "Yes": critical_flags.append({"name": "Syncope (Fainting)", "act": "Check pulse and breathing. Be prepared to start CPR."})
-        
-        if st.session_state['ecg_val'] in ["ST Elevation", "ST Depression", "Pathological Q Waves"]: critical_flags.append({"name": f"Severe ECG Finding ({st.session_state['ecg_val']})", "act": "Confirmed cardiac event. CAS EVAC is mandatory."})
-        if st.session_state['trop_val'] == "Positive": critical_flags.append({"name": "Troponin T POSITIVE", "act": "Confirmed death of heart muscle cells. Time is tissue. Immediate CAS EVAC."})
-
-        total_abnormal = len(abnormal_flags) + len(critical_flags)
-        
-        if len(critical_flags) > 0 or total_abnormal >= 3 or ml_prediction == 0:
-            st.markdown("<h2 style='color: #EF4444; border: 2px solid #EF4444; padding: 15px; text-align: center; border-radius: 5px; background: #450a0a;'>🔴 ZONE RED: IMMEDIATE CAS EVACUATION</h2>", unsafe_allow_html=True)
-            if ml_prediction == 0: st.error("🚨 **ML Model Alert:** The analytical algorithm has detected a high probability of a severe cardiovascular event.")
-            
-            st.write("### 🚨 CRITICAL PARAMETERS DETECTED")
-            for flag in critical_flags:
-                st.markdown(f"**<span style='color:#EF4444'>{flag['name']}</span>**", unsafe_allow_html=True)
-                st.caption(f"👉 **Action:** {flag['act']}")
+        with metrics.stage('render'):
+            if result.zone == ZONE_RED:
+                st.markdown("<h2 style='color: #EF4444; border: 2px solid #EF4444; padding: 15px; text-align: center; border-radius: 5px; background: #450a0a;'>🔴 ZONE RED: IMMEDIATE CAS EVACUATION</h2>", unsafe_allow_html=True)
+                if ml_prediction == 0: st.error("🚨 **ML Model Alert:** The analytical algorithm has detected a high probability of a severe cardiovascular event.")
             
-            if abnormal_flags:
-                st.write("### ⚠️ CONTRIBUTING FACTORS")
-                for flag in abnormal_flags:
-                    st.markdown(f"**<span style='color:#F59E0B'>{flag['name']}</span>**", unsafe_allow_html=True)
+                st.write("### 🚨 CRITICAL PARAMETERS DETECTED")
+                for flag in critical_flags:
+                    st.markdown(f"**<span style='color:#EF4444'>{flag['name']}</span>**", unsafe_allow_html=True)
                     st.caption(f"👉 **Action:** {flag['act']}")
             
-            st.error("**FINAL ORDER:** Initiate emergency MEDEVAC protocol. Keep patient calm, seated, and warm. Continuous monitoring required.")
+                if abnormal_flags:
+                    st.write("### ⚠️ CONTRIBUTING FACTORS")
+                    for flag in abnormal_flags:
+                        st.markdown(f"**<span style='color:#F59E0B'>{flag['name']}</span>**", unsafe_allow_html=True)
+                        st.caption(f"👉 **Action:** {flag['act']}")
+            
+                st.error("**FINAL ORDER:** Initiate emergency MEDEVAC protocol. Keep patient calm, seated, and warm. Continuous monitoring required.")
             
-        elif total_abnormal >= 1:
-            st.markdown("<h2 style='color: #F59E0B; border: 2px solid #F59E0B; padding: 15px; text-align: center; border-radius: 5px; background: #451a03;'>🟡 ZONE AMBER: CAUTION & MONITORING</h2>", unsafe_allow_html=True)
-            st.info("The ML model shows low baseline risk, but specific abnormal parameters require attention.")
+            elif result.zone == ZONE_AMBER:
+                st.markdown("<h2 style='color: #F59E0B; border: 2px solid #F59E0B; padding: 15px; text-align: center; border-radius: 5px; background: #451a03;'>🟡 ZONE AMBER: CAUTION & MONITORING</h2>", unsafe_allow_html=True)
+                st.info("The ML model shows low baseline risk, but specific abnormal parameters require attention.")
             
-            st.write("### ⚠️ ABNORMAL PARAMETERS DETECTED")
-            for flag in abnormal_flags:
-                st.markdown(f"**<span style='color:#F59E0B'>{flag['name']}</span>**", unsafe_allow_html=True)
-                st.caption(f"👉 **Action:** {flag['act']}")
+                st.write("### ⚠️ ABNORMAL PARAMETERS DETECTED")
+                for flag in abnormal_flags:
+                    st.markdown(f"**<span style='color:#F59E0B'>{flag['name']}</span>**", unsafe_allow_html=True)
+                    st.caption(f"👉 **Action:** {flag['act']}")
                 
-            st.warning("**FINAL ORDER:** Subject is stable but requires close monitoring. Withhold from heavy physical exertion. Reassess vitals every 4 hours. Consult MO.")
+                st.warning("**FINAL ORDER:** Subject is stable but requires close monitoring. Withhold from heavy physical exertion. Reassess vitals every 4 hours. Consult MO.")
             
-        else:
-            st.markdown("<h2 style='color: #10B981; border: 2px solid #10B981; padding: 15px; text-align: center; border-radius: 5px; background: #064e3b;'>🟢 ZONE GREEN: STABLE / FIT FOR DUTY</h2>", unsafe_allow_html=True)
-            st.write("Machine Learning analysis and clinical rule-checks show all inputted vital signs and markers are perfectly normal.")
-            st.success("**FINAL ORDER:** Continue standard acclimatization and monitoring protocols. No immediate medical intervention required.")
+            else:
+                st.markdown("<h2 style='color: #10B981; border: 2px solid #10B981; padding: 15px; text-align: center; border-radius: 5px; background: #064e3b;'>🟢 ZONE GREEN: STABLE / FIT FOR DUTY</h2>", unsafe_allow_html=True)
+                st.write("Machine Learning analysis and clinical rule-checks show all inputted vital signs and markers are perfectly normal.")
+                st.success("**FINAL ORDER:** Continue standard acclimatization and monitoring protocols. No immediate medical intervention required.")
+
+            # --- RISK DRIVERS ---
+            st.write("### 🔍 RISK DRIVERS")
+            st.caption(f"ML event probability: **{result.risk:.0%}** (model {result.model_version}). Inputs that moved the model's score the most for this subject:")
+            for driver in result.drivers:
+                raises = driver['contribution'] > 0
+                colour, arrow = ("#EF4444", "▲ raises risk") if raises else ("#10B981", "▼ lowers risk")
+                st.markdown(f"**{driver['label']}** ({driver['value']}): <span style='color:{colour}'>{arrow} ({driver['contribution']:+.2f})</span>", unsafe_allow_html=True)
+
+            # --- SERIAL REASSESSMENT ---
+            trend = st.session_state.get('trend')
+            if trend and st.session_state['subject_id']:
+                st.write("### 📈 SERIAL REASSESSMENT")
+                delta = trend['delta']
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("SpO2 (%)", st.session_state['spo2'], None if math.isnan(delta['spo2']) else f"{delta['spo2']:+.0f}")
+                m2.metric("Pulse (BPM)", st.session_state['pulse'], None if math.isnan(delta['pulse']) else f"{delta['pulse']:+.0f}", delta_color="inverse")
+                m3.metric("Systolic BP", st.session_state['s_bp'], None if math.isnan(delta['s_bp']) else f"{delta['s_bp']:+.0f}", delta_color="off")
+                m4.metric("Resp (/min)", st.session_state['resp'], None if math.isnan(delta['resp']) else f"{delta['resp']:+.0f}", delta_color="inverse")
+                if trend['alerts']:
+                    st.warning("**DETERIORATION ALERT:** Vital-sign trend has crossed a threshold since earlier assessments of this subject.")
+                    for alert in trend['alerts']:
+                        st.markdown(f"**<span style='color:#F59E0B'>{alert['name']}</span>**", unsafe_allow_html=True)
+                        st.caption(f"👉 **Action:** {alert['act']}")
+                elif all(math.isnan(v) for v in delta.values()):
+                    st.caption("First recorded assessment for this subject. Trends appear from the next reassessment.")
 
     # --- NAVIGATION CHECKERS ---
     def validate(step):
@@ -331,6 +390,7 @@ def main_app():
     with b1:
         if 1 < st.session_state['page_step'] <= 4:
             if st.button("PREVIOUS PAGE"):
+                metrics.count('arogyam_page_transitions_total', to=st.session_state['page_step'] - 1)
                 st.session_state['page_step'] -= 1
                 st.rerun()
                 
@@ -339,12 +399,15 @@ def main_app():
             action_text = "NEXT PAGE" if st.session_state['page_step'] < 3 else "RUN DIAGNOSIS"
             if st.button(action_text, type="primary"):
                 if validate(st.session_state['page_step']):
+                    metrics.count('arogyam_page_transitions_total', to=st.session_state['page_step'] + 1)
                     st.session_state['page_step'] += 1
                     st.rerun()
                 else:
+                    metrics.count('arogyam_validation_failures_total', step=st.session_state['page_step'])
                     st.error("⚠️ Please complete all mandatory (*) fields.")
         elif st.session_state['page_step'] == 4:
             if st.button("NEW ASSESSMENT"):
+                metrics.count('arogyam_page_transitions_total', to=1)
                 st.session_state.clear()
                 st.session_state['logged_in'] = True
                 st.session_state['page_step'] = 1
@@ -0,0 +1,4 @@
+"""Streamlit-free core of the AROGYAM triage tool."""
+from arogyam.engine import ScoringEngine, load_engine
+from arogyam.registry import MODULES, DiagnosisModule, get_model, register
+from arogyam.triage import Assessment, assess, assess_record
@@ -0,0 +1,5 @@
+import sys
+
+from arogyam.cli import main
+
+sys.exit(main())
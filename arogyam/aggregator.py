@@ -0,0 +1,174 @@
+"""Stand-in central aggregator for testing station sync without a network.
+
+    POST /ingest   one gzip-compressed batch from :func:`arogyam.sync.encode_batch`
+    GET  /healthz  liveness probe with record and station counts
+
+Rows land in a SQLite table with a unique key on ``(station, local_id,
+ts)`` so a batch that is re-sent after an interrupted acknowledgement is
+absorbed without double counting. A row whose ``assessment_key`` the
+station already sent is a corrected re-run of that assessment and
+replaces the earlier row instead of adding one. At most ``max_inflight`` batches are
+written at once; further batches are refused with 503 and ``Retry-After``
+so stations back off instead of piling up on a busy aggregator. Stations
+close their connection once drained, and one left idle is dropped after
+``IDLE_TIMEOUT`` seconds, so a worker soon frees up to answer that 503.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from arogyam.server import DEFAULT_HOST, JSONHandler, PooledHTTPServer
+from arogyam.sync import decode_batch
+
+DEFAULT_PORT = 8766
+DEFAULT_DB = 'aggregator.db'
+DEFAULT_WORKERS = 4
+MAX_INFLIGHT = 2
+RETRY_AFTER = 2
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+MAX_EXPANDED_BYTES = 256 * 1024 * 1024
+IDLE_TIMEOUT = 2.0      # stations send a drain's batches back to back
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    station TEXT NOT NULL,
+    local_id INTEGER NOT NULL,
+    subject_id TEXT,
+    ts REAL NOT NULL,
+    zone TEXT NOT NULL,
+    ml_prediction INTEGER NOT NULL,
+    margin REAL NOT NULL,
+    features TEXT NOT NULL,
+    critical_flags TEXT NOT NULL,
+    abnormal_flags TEXT NOT NULL,
+    received REAL NOT NULL,
+    assessment_key TEXT,
+    UNIQUE (station, local_id, ts)
+);
+CREATE INDEX IF NOT EXISTS ix_records_subject_ts ON records (subject_id, ts);
+CREATE INDEX IF NOT EXISTS ix_records_zone_ts ON records (zone, ts);
+"""
+
+MIGRATIONS = [
+    ('assessment_key', 'ALTER TABLE records ADD COLUMN assessment_key TEXT'),
+]
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_records_key ON records (station, assessment_key);
+"""
+
+_INSERT = """
+INSERT OR IGNORE INTO records
+    (station, local_id, subject_id, ts, zone, ml_prediction, margin, features, critical_flags, abnormal_flags, received,
+     assessment_key)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# A newer row (higher local_id) for a known assessment overwrites it in
+# place; the insert that follows then sees a duplicate and skips it.
+_REPLACE = """
+UPDATE records SET local_id = ?, subject_id = ?, ts = ?, zone = ?, ml_prediction = ?, margin = ?, features = ?,
+    critical_flags = ?, abnormal_flags = ?, received = ?
+WHERE station = ? AND assessment_key = ? AND local_id < ?
+"""
+
+
+class Aggregator:
+    """SQLite-backed sink for station batches."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(records)')}
+        for column, sql in MIGRATIONS:
+            if column not in columns:
+                conn.execute(sql)
+        conn.executescript(INDEXES)
+        conn.close()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def ingest(self, rows):
+        """Insert decoded batch rows; returns ``(accepted, duplicates)``."""
+        conn = self._conn()
+        received = time.time()
+        values = [(r['local_id'], r['subject_id'], r['ts'], r['zone'], r['ml_prediction'], r['margin'],
+                   json.dumps(r['features']), json.dumps(r['critical_flags']), json.dumps(r['abnormal_flags']), received)
+                  for r in rows]
+        # Batches from stations that predate assessment keys have no such column.
+        keys = [r.get('assessment_key') for r in rows]
+        with conn:
+            before = conn.total_changes
+            conn.executemany(_REPLACE, [
+                v + (r['station'], key, r['local_id']) for r, v, key in zip(rows, values, keys) if key is not None])
+            conn.executemany(_INSERT, [(r['station'],) + v + (key,) for r, v, key in zip(rows, values, keys)])
+            accepted = conn.total_changes - before
+        return accepted, len(rows) - accepted
+
+    def counts(self):
+        conn = self._conn()
+        records, stations = conn.execute('SELECT COUNT(*), COUNT(DISTINCT station) FROM records').fetchone()
+        return {'records': records, 'stations': stations}
+
+
+class AggregatorHandler(JSONHandler):
+    timeout = IDLE_TIMEOUT
+
+    def do_GET(self):
+        if self.path == '/healthz':
+            self._send_json(200, {'status': 'ok', **self.server.aggregator.counts()})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path.rstrip('/').rsplit('/', 1)[-1] != 'ingest':
+            self._send_json(404, {'error': 'not found'})
+            return
+        body = self._read_body(MAX_BATCH_BYTES)
+        if body is None:
+            return
+        if not self.server.inflight.acquire(blocking=False):
+            self._send_json(503, {'error': 'aggregator busy'}, {'Retry-After': str(RETRY_AFTER)})
+            return
+        try:
+            rows = decode_batch(body, MAX_EXPANDED_BYTES)
+            accepted, duplicates = self.server.aggregator.ingest(rows)
+        except sqlite3.Error as e:
+            self._send_json(503, {'error': str(e)}, {'Retry-After': str(RETRY_AFTER)})
+            return
+        except (OSError, EOFError, KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        finally:
+            self.server.inflight.release()
+        self._send_json(200, {'accepted': accepted, 'duplicates': duplicates})
+
+
+class AggregatorServer(PooledHTTPServer):
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), workers=DEFAULT_WORKERS, path=DEFAULT_DB,
+                 max_inflight=MAX_INFLIGHT, quiet=False):
+        self.aggregator = Aggregator(path)
+        self.inflight = threading.BoundedSemaphore(max_inflight)
+        super().__init__(address, AggregatorHandler, workers, quiet, thread_name_prefix='aggregator')
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, path=DEFAULT_DB, quiet=False):
+    with AggregatorServer((host, port), workers, path, quiet=quiet) as server:
+        print(f"AROGYAM aggregator on http://{host}:{server.server_port}/ingest -> {path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,53 @@
+"""Per-feature risk attribution for the heart model.
+
+The model is a logistic regression on standardized inputs, so each
+feature's share of the logistic margin is ``coef * scaled value`` and the
+shares add up exactly to the margin less the intercept. The engine returns
+them alongside the margin (:meth:`~arogyam.engine.ScoringEngine.explain`
+and :meth:`~arogyam.engine.ScoringEngine.explain_batch`); this module signs
+them toward the alert class, so a positive value raises the risk of a
+severe event, and ranks the largest as the subject's "drivers".
+"""
+import numpy as np
+
+from arogyam.features import FEATURE_LABELS, FEATURES
+from arogyam.rules import ALERT_CLASS
+
+TOP_K = 5
+
+
+def risk_sign(engine):
+    """``+1`` if a positive margin points toward :data:`ALERT_CLASS`, else ``-1``."""
+    return 1.0 if engine.classes[1] == ALERT_CLASS else -1.0
+
+
+def risk_terms(engine, margin, contributions):
+    """Alert probability and contributions signed so that positive raises it."""
+    sign = risk_sign(engine)
+    return engine.probability(sign * np.asarray(margin)), sign * contributions
+
+
+def top_k(contributions, k=TOP_K):
+    """Column indices of the ``k`` largest contributions by magnitude, per row, largest first."""
+    contributions = np.asarray(contributions)
+    magnitude = np.abs(contributions.reshape(-1, contributions.shape[-1]))
+    k = min(k, magnitude.shape[1])
+    rows = np.arange(magnitude.shape[0])
+    # k is small, so k argmax passes beat a partition + sort over every row.
+    idx = np.empty((magnitude.shape[0], k), dtype=np.intp)
+    for i in range(k):
+        j = idx[:, i] = magnitude.argmax(axis=1)
+        magnitude[rows, j] = -1.0
+    return idx.reshape(contributions.shape[:-1] + (k,))
+
+
+def drivers(contributions, values=None, k=TOP_K, names=FEATURES):
+    """Ranked ``{"feature", "label", "value", "contribution"}`` dicts for one subject.
+
+    ``contributions`` are risk-signed (see :func:`risk_terms`); ``value`` is
+    the form answer from ``values`` when given.
+    """
+    return [{"feature": names[j], "label": FEATURE_LABELS.get(names[j], names[j]),
+             "value": values.get(names[j]) if values is not None else None,
+             "contribution": float(contributions[j])}
+            for j in top_k(contributions, k)]
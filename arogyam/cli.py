@@ -0,0 +1,233 @@
+"""Command line entry point: ``python -m arogyam <command>``.
+
+    score    read subjects as JSON lines on stdin, write one result per line to stdout
+    serve    run the local HTTP scoring endpoint
+    roster   bulk-triage a CSV/Parquet roster into a results CSV
+    query    look up stored assessments by subject or by zone and time window
+    export-model  convert the sklearn pickles into the sklearn-free runtime model file
+    sync     push the local assessment store to a central aggregator
+    aggregator    run the stand-in central aggregator
+    label    record the confirmed outcome of a stored assessment, for retraining
+    train    incrementally retrain the heart model from labelled records and hot-swap it
+"""
+import argparse
+import json
+import os
+import sys
+
+from arogyam import server
+from arogyam.rules import RULES_ENV
+
+
+def cmd_score(args):
+    from arogyam.engine import load_engine
+    from arogyam.triage import assess_record
+
+    engine = load_engine()
+    store = _store(args)
+    failed = 0
+    out = sys.stdout
+    for lineno, line in enumerate(sys.stdin, 1):
+        if not line.strip():
+            continue
+        try:
+            result = assess_record(json.loads(line), engine, store=store)
+        except (TypeError, ValueError, AttributeError) as e:
+            failed += 1
+            result = {'error': str(e), 'line': lineno}
+        out.write(json.dumps(result))
+        out.write('\n')
+    out.flush()
+    return 1 if failed else 0
+
+
+def cmd_serve(args):
+    server.serve(args.host, args.port, args.workers, store=_store(args), quiet=args.quiet)
+    return 0
+
+
+def cmd_roster(args):
+    from arogyam.roster import score_roster
+
+    try:
+        counts = score_roster(args.source, args.output, chunksize=args.chunksize, drivers=args.drivers)
+    except (ValueError, ImportError) as e:
+        print(f"could not score roster: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(counts), file=sys.stderr)
+    return 0
+
+
+def cmd_query(args):
+    from arogyam.store import open_store
+
+    store = open_store(args.db)
+    if args.subject:
+        rows = store.history(args.subject, limit=args.limit)
+    else:
+        rows = store.recent(args.zone, hours=args.hours, limit=args.limit)
+    for row in rows:
+        print(json.dumps(row))
+    return 0
+
+
+def cmd_export_model(args):
+    from arogyam.engine import ARTIFACT_DIR, ScoringEngine, export_runtime_model
+
+    path = export_runtime_model(args.directory or ARTIFACT_DIR, args.output)
+    engine = ScoringEngine.from_file(path)
+    print(f"wrote {path} (version {engine.version}, {engine.n_features} features)", file=sys.stderr)
+    return 0
+
+
+def cmd_sync(args):
+    from arogyam.store import open_store
+    from arogyam.sync import SYNC_ENV, SyncWorker
+
+    url = args.url or os.environ.get(SYNC_ENV)
+    if not url:
+        print(f"no aggregator URL: pass --url or set ${SYNC_ENV}", file=sys.stderr)
+        return 2
+    store = open_store(args.db)
+    worker = SyncWorker(store, url, batch_rows=args.batch_rows, interval=args.interval)
+    if args.once:
+        worker.sync()
+        print(json.dumps(worker.status()), file=sys.stderr)
+        return 0
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_aggregator(args):
+    from arogyam import aggregator
+
+    aggregator.serve(args.host, args.port, args.workers, args.db, quiet=args.quiet)
+    return 0
+
+
+def cmd_label(args):
+    from arogyam.engine import load_engine
+    from arogyam.rules import ALERT_CLASS
+    from arogyam.store import open_store
+
+    # 'event' is the class the model alerts on; 'no-event' the other one.
+    classes = load_engine().classes.tolist()
+    label = ALERT_CLASS if args.outcome == 'event' else next(c for c in classes if c != ALERT_CLASS)
+    if not open_store(args.db).set_label(args.id, label):
+        print(f"no stored assessment with id {args.id}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_train(args):
+    from arogyam.engine import ARTIFACT_DIR
+    from arogyam.training import retrain
+
+    if not args.sources and not args.from_store:
+        print("nothing to train on: pass labelled files and/or --from-store", file=sys.stderr)
+        return 2
+    store = None
+    if args.from_store:
+        from arogyam.store import open_store
+        store = open_store(args.db)
+    report = retrain(args.sources, args.directory or ARTIFACT_DIR, holdout=args.holdout, label_column=args.label_column,
+                     chunksize=args.chunksize, max_loss_increase=args.max_loss_increase,
+                     max_accuracy_drop=args.max_accuracy_drop, max_recall_drop=args.max_recall_drop, dry_run=args.dry_run,
+                     store=store)
+    print(json.dumps(report, indent=2))
+    return 0 if report['promoted'] or args.dry_run else 1
+
+
+def _store(args):
+    if not args.record:
+        return None
+    from arogyam.store import open_store
+    return open_store(args.db)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='arogyam', description="AROGYAM headless triage")
+    parser.add_argument('--rules', help=f"JSON rule set overriding the built-in thresholds (default: ${RULES_ENV})")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    db = argparse.ArgumentParser(add_help=False)
+    db.add_argument('--db', help="assessment store path (default: $AROGYAM_DB or arogyam.db)")
+
+    p = sub.add_parser('score', parents=[db], help="score JSON lines from stdin")
+    p.add_argument('--record', action='store_true', help="persist every result to the assessment store")
+    p.set_defaults(func=cmd_score)
+
+    p = sub.add_parser('serve', parents=[db], help="run the HTTP scoring endpoint")
+    p.add_argument('--host', default=server.DEFAULT_HOST)
+    p.add_argument('--port', type=int, default=server.DEFAULT_PORT)
+    p.add_argument('--workers', type=int, default=server.DEFAULT_WORKERS)
+    p.add_argument('--quiet', action='store_true', help="suppress per-request access logs")
+    p.add_argument('--record', action='store_true', help="persist every result to the assessment store")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('roster', help="bulk-triage a CSV/Parquet roster")
+    p.add_argument('source')
+    p.add_argument('output')
+    p.add_argument('--chunksize', type=int, default=50_000)
+    p.add_argument('--drivers', type=int, default=3, help="top risk-driver columns per subject (0 to skip attribution)")
+    p.set_defaults(func=cmd_roster)
+
+    p = sub.add_parser('query', parents=[db], help="look up stored assessments")
+    which = p.add_mutually_exclusive_group(required=True)
+    which.add_argument('--subject', help="history of one subject ID")
+    which.add_argument('--zone', choices=["RED", "AMBER", "GREEN"], help="assessments in a zone")
+    p.add_argument('--hours', type=float, default=24, help="time window for --zone (default: 24)")
+    p.add_argument('--limit', type=int, default=1000)
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('export-model', help="write the sklearn-free runtime model file")
+    p.add_argument('--directory', help="folder holding heart_disease_model.sav and scaler.pkl")
+    p.add_argument('--output', help="runtime file to write (default: heart_disease_model.npz next to the pickles)")
+    p.set_defaults(func=cmd_export_model)
+
+    p = sub.add_parser('sync', parents=[db], help="push stored assessments to a central aggregator")
+    p.add_argument('--url', help="aggregator base URL (default: $AROGYAM_SYNC_URL)")
+    p.add_argument('--once', action='store_true', help="drain the outbox once and exit instead of syncing continuously")
+    p.add_argument('--batch-rows', type=int, default=2000, help="assessments per compressed batch")
+    p.add_argument('--interval', type=float, default=5.0, help="seconds between polls once the outbox is drained")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser('aggregator', help="run the stand-in central aggregator")
+    p.add_argument('--host', default=server.DEFAULT_HOST)
+    p.add_argument('--port', type=int, default=8766)
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--db', default='aggregator.db', help="aggregator database path (default: aggregator.db)")
+    p.add_argument('--quiet', action='store_true', help="suppress per-request access logs")
+    p.set_defaults(func=cmd_aggregator)
+
+    p = sub.add_parser('label', parents=[db], help="record the confirmed outcome of a stored assessment")
+    p.add_argument('id', type=int, help="assessment id, as printed by 'query'")
+    p.add_argument('outcome', choices=['event', 'no-event'], help="whether the severe cardiac event was confirmed")
+    p.set_defaults(func=cmd_label)
+
+    p = sub.add_parser('train', parents=[db], help="incrementally retrain the heart model and hot-swap it if it validates")
+    p.add_argument('sources', nargs='*', help="labelled CSV/Parquet files: roster columns plus the label column")
+    p.add_argument('--from-store', action='store_true', help="also train on labelled assessments in the assessment store")
+    p.add_argument('--label-column', default='label', help="column holding the model class (default: label)")
+    p.add_argument('--holdout', help="labelled file to validate on (default: hold out 10%% of the streamed rows)")
+    p.add_argument('--directory', help="folder holding the deployed runtime model")
+    p.add_argument('--chunksize', type=int, default=50_000)
+    p.add_argument('--max-loss-increase', type=float, default=0.0,
+                   help="hold-out log loss the candidate may lose against the deployed model and still be promoted")
+    p.add_argument('--max-accuracy-drop', type=float, default=0.0,
+                   help="hold-out accuracy the candidate may lose against the deployed model and still be promoted")
+    p.add_argument('--max-recall-drop', type=float, default=0.0,
+                   help="hold-out recall of the alert (ZONE RED) class the candidate may lose and still be promoted")
+    p.add_argument('--dry-run', action='store_true', help="train and validate but do not replace the model")
+    p.set_defaults(func=cmd_train)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.rules:
+        os.environ[RULES_ENV] = args.rules
+    return args.func(args)
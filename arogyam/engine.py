@@ -0,0 +1,245 @@
+"""Resident scoring engine for the heart disease model.
+
+The model is a ``StandardScaler`` feeding a binary ``LogisticRegression``.
+Both are affine, so the scaler is folded into the model once at load time
+and a prediction becomes a single dot product:
+
+    margin = x @ (coef / scale) + (intercept - (coef / scale) @ mean)
+
+Folding reorders the floating point operations, so rows whose margin falls
+within ``BOUNDARY_TOL`` of the decision boundary are re-scored with the
+unfused ``(x - mean) / scale`` then ``@ coef.T + intercept`` sequence that
+sklearn itself performs. Labels are therefore identical to the sklearn
+pipeline.
+
+The engine is built from plain arrays. :func:`read_engine` reads them from
+the sklearn-free runtime file (see :mod:`arogyam.modelfile`) and only falls
+back to unpickling the sklearn artifacts when that file is missing. Either
+way the model's column order must be :data:`arogyam.features.FEATURES`
+(see :func:`check_features`), or it is refused rather than applied to
+misordered inputs. :func:`load_engine` serves the heart model from the
+shared, bounded model cache in :mod:`arogyam.registry`.
+"""
+import hashlib
+import os
+import threading
+import warnings
+
+import numpy as np
+
+from arogyam import modelfile
+from arogyam.features import FEATURES, TRAINING_FEATURES
+
+ARTIFACT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_FILE = 'heart_disease_model.sav'
+SCALER_FILE = 'scaler.pkl'
+RUNTIME_FILE = 'heart_disease_model.npz'
+
+# Folding error is ~1e-14 for the feature ranges the app accepts; anything
+# closer to the boundary than this is re-scored unfused.
+BOUNDARY_TOL = 1e-9
+
+# Rows checked against the unfused (or sklearn) path when an engine is built.
+SELF_CHECK_ROWS = 2048
+
+
+class ScoringEngine:
+    def __init__(self, coef, intercept, mean, scale, classes, features=None, version=None):
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        self.intercept = float(intercept)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.n_features = self.coef.shape[0]
+        self.features = [str(f) for f in features] if features is not None else None
+        self.version = version
+        if len(self.classes) != 2:
+            raise ValueError("ScoringEngine only supports a binary model")
+        if not self.mean.shape == self.scale.shape == (self.n_features,):
+            raise ValueError("scaler statistics do not match the number of coefficients")
+
+        self.weights = np.ascontiguousarray(self.coef / self.scale)
+        self.bias = float(self.intercept - self.weights @ self.mean)
+        self._coef_col = self.coef.reshape(-1, 1)
+
+        # Streamlit serves each session on its own thread, so the row buffer
+        # is per-thread rather than per-engine.
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, version=None, features=None):
+        if model.coef_.shape[0] != 1:
+            raise ValueError("ScoringEngine only supports a binary LogisticRegression")
+        arrays = modelfile.arrays_from_sklearn(model, scaler, features)
+        return cls(version=version, **arrays)
+
+    @classmethod
+    def from_file(cls, path):
+        arrays, version = modelfile.read_model(path)
+        return cls(version=version, **arrays)
+
+    def to_file(self, path, version=None):
+        arrays = {'coef': self.coef, 'intercept': self.intercept, 'mean': self.mean, 'scale': self.scale,
+                  'classes': self.classes, 'features': self.features or [f"x{i}" for i in range(self.n_features)]}
+        self.version = modelfile.write_model(path, arrays, version or self.version)
+        return self.version
+
+    @property
+    def nbytes(self):
+        """Approximate resident size, used to bound the model cache."""
+        return sum(a.nbytes for a in (self.coef, self.mean, self.scale, self.classes, self.weights))
+
+    def _row_buffer(self):
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = self._local.buf = np.empty(self.n_features, dtype=np.float64)
+        return buf
+
+    def exact_margin(self, X):
+        """Unfused margin, op-for-op what ``scaler.transform`` + ``decision_function`` compute."""
+        X = np.array(X, dtype=np.float64).reshape(-1, self.n_features)
+        X -= self.mean
+        X /= self.scale
+        return (X @ self._coef_col + self.intercept).reshape(-1)
+
+    def decision(self, features):
+        """Logistic margin for one subject; > 0 selects ``classes[1]``."""
+        buf = self._row_buffer()
+        buf[:] = features
+        margin = float(buf @ self.weights) + self.bias
+        if abs(margin) <= BOUNDARY_TOL:
+            margin = float(self.exact_margin(buf)[0])
+        return margin
+
+    def predict(self, features):
+        """Drop-in for ``model.predict(scaler.transform([features]))[0]``."""
+        return self.classes[int(self.decision(features) > 0)]
+
+    def decision_batch(self, X, out=None):
+        """Margins for an ``(n, n_features)`` matrix, written into ``out`` if given."""
+        X = np.asarray(X, dtype=np.float64)
+        margins = np.matmul(X, self.weights, out=out)
+        margins += self.bias
+        near = np.flatnonzero(np.abs(margins) <= BOUNDARY_TOL)
+        if near.size:
+            margins[near] = self.exact_margin(X[near])
+        return margins
+
+    def predict_batch(self, X):
+        return self.classes[(self.decision_batch(X) > 0).astype(np.intp)]
+
+    def explain(self, features):
+        """``(margin, contributions)`` for one subject.
+
+        ``contributions[i]`` is ``coef[i]`` times the scaled value of feature
+        ``i``; they sum to ``margin - intercept``.
+        """
+        margin = self.decision(features)
+        contributions = self._row_buffer() - self.mean
+        contributions *= self.weights
+        return margin, contributions
+
+    def explain_batch(self, X, out=None):
+        """Margins and the ``(n, n_features)`` contribution matrix, written into ``out`` if given."""
+        X = np.asarray(X, dtype=np.float64)
+        margins = self.decision_batch(X)
+        contributions = np.subtract(X, self.mean, out=out)
+        contributions *= self.weights
+        return margins, contributions
+
+    @staticmethod
+    def probability(margin):
+        """``predict_proba`` of ``classes[1]`` for a margin or array of margins."""
+        return 0.5 * (1.0 + np.tanh(0.5 * np.asarray(margin)))
+
+    def _probe_rows(self, n_rows, seed):
+        rng = np.random.default_rng(seed)
+        X = self.mean + rng.standard_normal((n_rows, self.n_features)) * 3 * self.scale
+        # Pin a few rows onto the boundary itself to exercise the fallback.
+        X[:8] -= np.outer(self.decision_batch(X[:8]) / (self.weights @ self.weights), self.weights)
+        return X
+
+    def _compare(self, X, expected, expected_single, reference):
+        # A one-row product can round differently from the same row inside a
+        # matrix product, so boundary rows are checked against the reference's
+        # own single-row result.
+        got = self.predict_batch(X)
+        mismatches = int(np.count_nonzero(got != expected))
+        if mismatches:
+            raise RuntimeError(f"Fused scorer disagrees with {reference} on {mismatches}/{len(X)} rows")
+        single = np.array([self.predict(row) for row in X[:len(expected_single)]])
+        if np.any(single != expected_single):
+            raise RuntimeError(f"Fused single-row scorer disagrees with {reference}")
+
+    def self_check(self, n_rows=SELF_CHECK_ROWS, seed=0):
+        """Compare fused and unfused labels on rows spread around the training mean."""
+        X = self._probe_rows(n_rows, seed)
+        expected = self.classes[(self.exact_margin(X) > 0).astype(np.intp)]
+        expected_single = np.array([self.classes[int(self.exact_margin(row)[0] > 0)] for row in X[:64]])
+        self._compare(X, expected, expected_single, "the unfused path")
+
+    def check_against_sklearn(self, model, scaler, n_rows=SELF_CHECK_ROWS, seed=0):
+        """Compare labels and unfused margins with the sklearn pipeline itself."""
+        X = self._probe_rows(n_rows, seed)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            scaled = scaler.transform(X)
+            expected = model.predict(scaled)
+            margins = model.decision_function(scaled)
+            expected_single = np.array([model.predict(scaler.transform(X[i:i + 1]))[0] for i in range(64)])
+        if not np.array_equal(self.exact_margin(X), margins):
+            raise RuntimeError("Unfused margins are not bit-identical to sklearn's decision_function")
+        self._compare(X, expected, expected_single, "sklearn")
+
+
+def check_features(features, source):
+    """Raise ``ModelFileError`` unless a heart model's column names are :data:`FEATURES`, in order."""
+    if list(features or []) != FEATURES:
+        raise modelfile.ModelFileError(
+            f"{source}: model columns {list(features or [])} do not match the app's feature order {FEATURES}")
+
+
+def load_pickled_engine(directory=ARTIFACT_DIR):
+    """Build an engine from the sklearn pickles, checked against sklearn itself."""
+    scaler_path = os.path.join(directory, SCALER_FILE)
+    model, scaler = modelfile.load_pickles(os.path.join(directory, MODEL_FILE), scaler_path)
+    # The scaler knows its training column names; map them onto the app's.
+    fitted = [str(f) for f in getattr(scaler, 'feature_names_in_', [])]
+    if fitted and fitted != TRAINING_FEATURES:
+        check_features(fitted, scaler_path)
+    engine = ScoringEngine.from_sklearn(model, scaler, features=FEATURES)
+    engine.check_against_sklearn(model, scaler)
+    return engine
+
+
+def read_engine(directory=ARTIFACT_DIR):
+    """Build the heart model engine from ``directory``, preferring the sklearn-free runtime file."""
+    runtime = os.path.join(directory, RUNTIME_FILE)
+    if os.path.exists(runtime):
+        engine = ScoringEngine.from_file(runtime)
+        check_features(engine.features, runtime)
+        engine.self_check()
+        return engine
+    return load_pickled_engine(directory)
+
+
+def load_engine(directory=ARTIFACT_DIR):
+    """The heart model in ``directory``, loaded on first use and shared by the whole process."""
+    from arogyam.registry import get_model
+    return get_model('heart', directory)
+
+
+def export_runtime_model(directory=ARTIFACT_DIR, out=None):
+    """Convert the sklearn pickles in ``directory`` into the runtime file; returns its path."""
+    engine = load_pickled_engine(directory)
+    out = out or os.path.join(directory, RUNTIME_FILE)
+    h = hashlib.sha256()
+    for name in (MODEL_FILE, SCALER_FILE):
+        with open(os.path.join(directory, name), 'rb') as f:
+            h.update(f.read())
+    engine.to_file(out, version=f"sklearn-{h.hexdigest()[:12]}")
+    # Round-trip through the file so what ships is what was verified.
+    shipped = ScoringEngine.from_file(out)
+    check_features(shipped.features, out)
+    shipped.self_check()
+    return out
@@ -0,0 +1,105 @@
+"""Feature encoding shared by the page-4 wizard and bulk roster scoring.
+
+Field names are the ``st.session_state`` keys used by the wizard; roster
+files use the same names as column headers and the same option labels as
+the widgets (``"Yes"``/``"No"``, ``"Male"``/``"Female"``, ...).
+"""
+import numpy as np
+
+# Column order expected by scaler.pkl / heart_disease_model.sav.
+FEATURES = [
+    'age', 'sex', 's_bp', 'd_bp', 'pulse', 'resp', 'spo2',
+    'cp_yn', 'cp_type', 'rad', 'sweat', 'nausea', 'doe', 'syncope',
+    'comorb', 'fam_hx', 'per_hx', 'ecg_val', 'hb_val', 'trop_val',
+]
+COL = {name: i for i, name in enumerate(FEATURES)}
+
+# Column names scaler.pkl was fitted with, in FEATURES order. Exported runtime
+# files carry FEATURES instead; see arogyam.engine.check_features.
+TRAINING_FEATURES = [
+    'age', 'sex', 'systolic_bp', 'diastolic_bp', 'pulse_rate', 'resp_rate', 'spo2',
+    'chest_pain_yes_no', 'cp_type', 'radiation', 'sweating', 'nausea', 'doe', 'syncope',
+    'comorbidities', 'fam_hx', 'per_hx', 'ecg_changes', 'hb', 'troponin_t',
+]
+
+# Display names for result screens, in FEATURES order.
+FEATURE_LABELS = {
+    'age': "Age", 'sex': "Sex", 's_bp': "Systolic BP", 'd_bp': "Diastolic BP", 'pulse': "Pulse",
+    'resp': "Respiratory Rate", 'spo2': "SpO2", 'cp_yn': "Chest Pain", 'cp_type': "Pain Type",
+    'rad': "Radiation of Pain", 'sweat': "Sweating", 'nausea': "Nausea / Vomiting", 'doe': "Dyspnoea on Exertion",
+    'syncope': "Syncope", 'comorb': "Comorbidity", 'fam_hx': "Family History", 'per_hx': "Personal History",
+    'ecg_val': "ECG Finding", 'hb_val': "Hemoglobin", 'trop_val': "Troponin T",
+}
+
+CP_MAP = {"Tight": 0, "Heavy": 1, "Crushing": 2}
+COMORB_MAP = {"None": 0, "Hypertension": 1, "Diabetes": 2, "Dyslipidemia": 3}
+ECG_MAP = {"Normal": 0, "ST Elevation": 1, "ST Depression": 2, "T Wave Inversion": 3, "LBBB": 4, "Pathological Q Waves": 5}
+
+YES_NO_FIELDS = ['cp_yn', 'rad', 'sweat', 'nausea', 'doe', 'syncope', 'fam_hx', 'per_hx']
+NUMERIC_FIELDS = ['age', 's_bp', 'd_bp', 'pulse', 'resp', 'spo2', 'hb_val']
+
+# Values the wizard substitutes when the ECG / Hb toggles are off.
+ECG_DEFAULT = "Normal"
+HB_DEFAULT = 14.0
+
+
+def encode(values):
+    """Encode one subject (a mapping such as ``st.session_state``) into the model's feature list."""
+    yn = {k: 1 if values[k] == "Yes" else 0 for k in YES_NO_FIELDS}
+    return [
+        values['age'], 1 if values['sex'] == "Male" else 0, values['s_bp'], values['d_bp'],
+        values['pulse'], values['resp'], values['spo2'],
+        yn['cp_yn'], CP_MAP.get(values['cp_type'], 0) if yn['cp_yn'] == 1 else 0,
+        yn['rad'], yn['sweat'], yn['nausea'], yn['doe'], yn['syncope'],
+        COMORB_MAP.get(values['comorb'], 0), yn['fam_hx'], yn['per_hx'],
+        ECG_MAP.get(values['ecg_val'], 0), values['hb_val'], 1 if values['trop_val'] == "Positive" else 0,
+    ]
+
+
+def encode_frame(df, out=None):
+    """Column-wise equivalent of :func:`encode` for a pandas DataFrame.
+
+    Returns an ``(len(df), len(FEATURES))`` float64 matrix; pass ``out`` to
+    reuse a buffer across chunks.
+    """
+    n = len(df)
+    if out is None or out.shape[0] < n:
+        out = np.empty((n, len(FEATURES)), dtype=np.float64)
+    X = out[:n]
+
+    for name in NUMERIC_FIELDS:
+        if name == 'hb_val' and name not in df:
+            X[:, COL[name]] = HB_DEFAULT
+            continue
+        col = df[name]
+        if name == 'hb_val':
+            col = col.fillna(HB_DEFAULT)
+        X[:, COL[name]] = col.to_numpy(dtype=np.float64)
+
+    for name in YES_NO_FIELDS:
+        X[:, COL[name]] = _equals(df[name], "Yes")
+    X[:, COL['sex']] = _equals(df['sex'], "Male")
+    X[:, COL['trop_val']] = _equals(df['trop_val'], "Positive")
+
+    X[:, COL['cp_type']] = df['cp_type'].map(CP_MAP).fillna(0).to_numpy(dtype=np.float64) if 'cp_type' in df else 0
+    X[:, COL['cp_type']] *= X[:, COL['cp_yn']]
+    X[:, COL['comorb']] = df['comorb'].map(COMORB_MAP).fillna(0).to_numpy(dtype=np.float64)
+    X[:, COL['ecg_val']] = df['ecg_val'].map(ECG_MAP).fillna(0).to_numpy(dtype=np.float64) if 'ecg_val' in df else 0
+    return X
+
+
+def _equals(col, label):
+    # Nullable string columns compare to <NA> on blanks; treat those as "No".
+    return col.eq(label).fillna(False).to_numpy(dtype=bool)
+
+# Option label -> encoded value for every categorical field, so rules and
+# other callers can speak in form labels and still run on encoded matrices.
+YES_NO_MAP = {"No": 0, "Yes": 1}
+LABELS = {
+    **{name: YES_NO_MAP for name in YES_NO_FIELDS},
+    'sex': {"Female": 0, "Male": 1},
+    'cp_type': CP_MAP,
+    'comorb': COMORB_MAP,
+    'ecg_val': ECG_MAP,
+    'trop_val': {"Negative": 0, "Positive": 1},
+}
@@ -0,0 +1,236 @@
+"""Low-overhead hot-path instrumentation exported in Prometheus text format.
+
+    with metrics.stage('encode'):
+        features = encode(values)
+    metrics.count('arogyam_assessments_total', zone=zone)
+
+Stage timings go into one histogram, ``arogyam_stage_seconds{stage=...}``,
+and everything else is a labelled counter. The registry is process-wide
+and shared by every Streamlit session and server thread.
+
+Exposition (:func:`render`) is served at ``/metrics`` by the scoring
+endpoint, and :func:`start_exporter` can also serve it on its own port
+(``$AROGYAM_METRICS_PORT``) or rewrite a file every few seconds
+(``$AROGYAM_METRICS_FILE``, for a node_exporter textfile collector).
+
+Setting ``AROGYAM_METRICS=0`` turns instrumentation off at import time:
+:func:`stage` then returns a shared no-op context manager and
+:func:`count` does nothing.
+"""
+import atexit
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+METRICS_ENV = 'AROGYAM_METRICS'
+METRICS_FILE_ENV = 'AROGYAM_METRICS_FILE'
+METRICS_PORT_ENV = 'AROGYAM_METRICS_PORT'
+FILE_INTERVAL = 10.0
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+log = logging.getLogger(__name__)
+
+ENABLED = os.environ.get(METRICS_ENV, '1').strip().lower() not in ('0', 'off', 'false', 'no')
+
+STAGE_METRIC = 'arogyam_stage_seconds'
+# Upper bounds in seconds: single-row scoring sits in the microsecond
+# buckets, Streamlit reruns and roster chunks in the millisecond ones.
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HELP = {
+    STAGE_METRIC: "Wall time spent in each hot-path stage.",
+    'arogyam_assessments_total': "Completed assessments by triage zone.",
+    'arogyam_page_transitions_total': "Wizard page transitions.",
+    'arogyam_validation_failures_total': "Wizard pages rejected by validate(step).",
+    'arogyam_model_loads_total': "Models loaded into the model cache.",
+    'arogyam_model_evictions_total': "Models evicted from the model cache.",
+    'arogyam_model_reloads_total': "Cached models replaced after their artifact changed on disk.",
+    'arogyam_roster_rows_total': "Roster rows triaged in bulk.",
+}
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'lock')
+
+    def __init__(self, lock):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = lock
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = _Histogram(self._lock)
+        return h
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items())
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, n) in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, c in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += c
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {n}")
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            for h in self._histograms.values():
+                h.counts = [0] * len(h.counts)
+                h.sum = 0.0
+                h.count = 0
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+REGISTRY = Registry()
+
+
+class _Stage:
+    __slots__ = ('histogram', 't0')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0)
+
+
+_stage_histograms = {}
+
+
+_NOOP = nullcontext()
+
+
+def stage(name):
+    """Context manager timing one pass through stage ``name``."""
+    if not ENABLED:
+        return _NOOP
+    h = _stage_histograms.get(name)
+    if h is None:
+        h = _stage_histograms[name] = REGISTRY.histogram(STAGE_METRIC, stage=name)
+    return _Stage(h)
+
+
+def count(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.count(name, value, **labels)
+
+
+def render():
+    return REGISTRY.render()
+
+
+# --- exporters ---
+def write_file(path):
+    """Atomically replace ``path`` with the current exposition."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _file_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        write_file(path)
+
+
+@functools.lru_cache(maxsize=None)
+def start_exporter(path=None, port=None, interval=FILE_INTERVAL):
+    """Start the file and/or HTTP exporters configured here or by environment, once per process.
+
+    Returns the HTTP server if one was started (its ``server_port`` is useful when ``port=0``).
+    A port that cannot be bound is logged and left alone: metrics must never
+    break the app, and the cached ``None`` stops every rerun retrying it.
+    """
+    if not ENABLED:
+        return None
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    port = port if port is not None else os.environ.get(METRICS_PORT_ENV)
+    if path:
+        threading.Thread(target=_file_loop, args=(path, interval), name='arogyam-metrics-file', daemon=True).start()
+        atexit.register(write_file, path)
+    server = None
+    if port not in (None, ''):
+        try:
+            server = HTTPServer(('127.0.0.1', int(port)), MetricsHandler)
+        except (OSError, ValueError) as e:
+            log.error("Metrics exporter not started on port %s: %s", port, e)
+            return None
+        threading.Thread(target=server.serve_forever, name='arogyam-metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,95 @@
+"""Versioned, checksummed runtime format for the heart model.
+
+``heart_disease_model.sav`` and ``scaler.pkl`` need sklearn to unpickle
+and tie the app to the sklearn version that wrote them. Everything the
+runtime needs is five small arrays, so
+:func:`~arogyam.engine.export_runtime_model` writes those (with
+:func:`write_model`) to a plain ``.npz`` file that :func:`read_model`
+loads with NumPy alone:
+
+    coef, intercept        LogisticRegression.coef_[0], intercept_[0]
+    mean, scale            StandardScaler.mean_, scale_
+    classes, features      class labels and column order
+
+A SHA-256 over the format version and every array is stored alongside
+them and verified on load. sklearn is only imported by the export step.
+"""
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+ARRAYS = ['coef', 'intercept', 'mean', 'scale', 'classes', 'features']
+
+
+class ModelFileError(ValueError):
+    pass
+
+
+def checksum(arrays, model_version):
+    h = hashlib.sha256()
+    h.update(f"arogyam-model/{FORMAT_VERSION}/{model_version}".encode())
+    for name in ARRAYS:
+        a = np.ascontiguousarray(arrays[name])
+        h.update(name.encode())
+        h.update(a.dtype.str.encode())
+        h.update(repr(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def write_model(path, arrays, model_version=None):
+    """Write ``arrays`` (see :data:`ARRAYS`) to ``path`` atomically."""
+    model_version = model_version or time.strftime('%Y%m%dT%H%M%S')
+    arrays = {
+        'coef': np.asarray(arrays['coef'], dtype=np.float64),
+        'intercept': np.asarray(arrays['intercept'], dtype=np.float64).reshape(()),
+        'mean': np.asarray(arrays['mean'], dtype=np.float64),
+        'scale': np.asarray(arrays['scale'], dtype=np.float64),
+        'classes': np.asarray(arrays['classes'], dtype=np.int64),
+        'features': np.asarray(arrays['features'], dtype=str),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, format_version=np.int64(FORMAT_VERSION), model_version=np.str_(model_version),
+                 sha256=np.str_(checksum(arrays, model_version)), **arrays)
+    os.replace(tmp, path)
+    return model_version
+
+
+def read_model(path):
+    """Load and verify a runtime model file; returns ``(arrays, model_version)``."""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['format_version'])
+        if version != FORMAT_VERSION:
+            raise ModelFileError(f"{path}: unsupported model format version {version}")
+        arrays = {name: data[name] for name in ARRAYS}
+        model_version = str(data['model_version'])
+        expected = str(data['sha256'])
+    if checksum(arrays, model_version) != expected:
+        raise ModelFileError(f"{path}: checksum mismatch, file is corrupt or was edited")
+    return arrays, model_version
+
+
+def arrays_from_sklearn(model, scaler, features=None):
+    n = model.coef_.shape[1]
+    return {
+        'coef': model.coef_[0],
+        'intercept': model.intercept_[0],
+        'mean': scaler.mean_ if scaler.with_mean else np.zeros(n),
+        'scale': scaler.scale_ if scaler.with_std else np.ones(n),
+        'classes': model.classes_,
+        'features': features if features is not None else getattr(scaler, 'feature_names_in_', [f"x{i}" for i in range(n)]),
+    }
+
+
+def load_pickles(model_path, scaler_path):
+    """Unpickle the sklearn artifacts; this is the only path that imports sklearn."""
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    return model, scaler
@@ -0,0 +1,191 @@
+"""Registry of diagnosis modules and the process-wide model cache they share.
+
+Each :class:`DiagnosisModule` declares what the app needs to run it: the
+feature schema, the encoder that turns a form mapping into that schema,
+its clinical rule set and how to load its model artifact. Nothing is
+loaded at import time. :func:`get_model` loads a module's model the first
+time any session selects it and keeps it in a :class:`ModelCache` shared
+by every session in the process. The cache is bounded by model count and
+by resident bytes, and evicts the least recently used model first, so a
+worker only holds the models its sessions are actually using. Cached
+models are hot-swapped when their artifact file is replaced (see
+:mod:`arogyam.training`).
+
+Modules without a model yet (``load_model=None``) are listed so the UI can
+show them, but they cannot be scored.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from arogyam import features, metrics
+from arogyam.engine import ARTIFACT_DIR, RUNTIME_FILE, read_engine
+from arogyam.rules import load_ruleset
+
+CACHE_ENV = 'AROGYAM_MODEL_CACHE'    # max resident models
+MAX_MODELS = 4
+MAX_MODEL_BYTES = 512 * 1024 * 1024
+RELOAD_INTERVAL = 5.0                # seconds between checks for a replaced model file
+
+
+@dataclass(frozen=True)
+class DiagnosisModule:
+    key: str
+    title: str                 # sidebar label
+    icon: str                  # bootstrap icon name for option_menu
+    features: tuple = ()       # form field names, in model column order
+    encode: object = None      # values mapping -> feature list
+    load_rules: object = None  # () -> RuleSet
+    load_model: object = None  # directory -> model; None while the module is in development
+    artifact: str = None       # model file the loader reads, for display
+
+    @property
+    def ready(self):
+        return self.load_model is not None
+
+
+MODULES = OrderedDict()
+
+log = logging.getLogger(__name__)
+
+
+def register(module):
+    if module.key in MODULES:
+        raise ValueError(f"diagnosis module {module.key!r} is already registered")
+    MODULES[module.key] = module
+    return module
+
+
+def by_title(title):
+    return next(m for m in MODULES.values() if m.title == title)
+
+
+register(DiagnosisModule(
+    'heart', "Heart Disease", 'heart-pulse', tuple(features.FEATURES), features.encode,
+    load_ruleset, read_engine, RUNTIME_FILE))
+register(DiagnosisModule('stroke', "Brain Stroke", 'lightning-charge'))
+
+
+def _nbytes(model):
+    return getattr(model, 'nbytes', 0)
+
+
+def _stamp(key, directory):
+    """``(mtime, size)`` of a module's artifact, or ``None`` if it has none on disk."""
+    artifact = MODULES[key].artifact
+    if not artifact:
+        return None
+    try:
+        st = os.stat(os.path.join(directory, artifact))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Entry:
+    __slots__ = ('model', 'stamp', 'checked')
+
+    def __init__(self, model, stamp, checked):
+        self.model = model
+        self.stamp = stamp
+        self.checked = checked
+
+
+class ModelCache:
+    """Thread-safe LRU of loaded models keyed by ``(module key, directory)``.
+
+    Every ``reload_interval`` seconds a lookup re-stats the model's artifact
+    and, if the file was replaced, loads the new version and swaps it in.
+    Callers holding the previous model object keep using it undisturbed.
+    """
+
+    def __init__(self, max_models=MAX_MODELS, max_bytes=MAX_MODEL_BYTES, reload_interval=RELOAD_INTERVAL):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.reload_interval = reload_interval
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def _cached(self, cache_key, now):
+        """The cached model, or ``None`` if it is missing or its artifact has changed."""
+        with self._lock:
+            entry = self._models.get(cache_key)
+            if entry is None:
+                return None
+            self._models.move_to_end(cache_key)
+            if now - entry.checked < self.reload_interval:
+                return entry.model
+            entry.checked = now
+        return entry.model if _stamp(*cache_key) == entry.stamp else None
+
+    def get(self, key, directory=ARTIFACT_DIR):
+        cache_key = (key, directory)
+        model = self._cached(cache_key, time.monotonic())
+        if model is not None:
+            return model
+        with self._lock:
+            loading = self._loading.setdefault(cache_key, threading.Lock())
+
+        # One loader per model: concurrent sessions asking for the same cold
+        # (or replaced) model wait for the first load instead of repeating it.
+        with loading:
+            with self._lock:
+                entry = self._models.get(cache_key)
+            stamp = _stamp(key, directory)
+            if entry is not None and entry.stamp == stamp:
+                return entry.model
+            module = MODULES[key]
+            if not module.ready:
+                raise LookupError(f"diagnosis module {key!r} has no model yet")
+            try:
+                with metrics.stage('model_load'):
+                    model = module.load_model(directory)
+            except Exception:
+                if entry is None:
+                    raise
+                # A bad replacement file must not take down a working model.
+                log.exception("Keeping model %r version %s; reloading %s failed", key, getattr(entry.model, 'version', None), directory)
+                entry.stamp = stamp
+                return entry.model
+            metrics.count('arogyam_model_reloads_total' if entry is not None else 'arogyam_model_loads_total', model=key)
+            with self._lock:
+                self._models[cache_key] = _Entry(model, stamp, time.monotonic())
+                self._models.move_to_end(cache_key)
+                self.loads += 1
+                self._loading.pop(cache_key, None)
+                self._evict()
+        return model
+
+    def _evict(self):
+        while len(self._models) > 1 and (len(self._models) > self.max_models or self.resident_bytes() > self.max_bytes):
+            (key, _), _ = self._models.popitem(last=False)
+            self.evictions += 1
+            metrics.count('arogyam_model_evictions_total', model=key)
+
+    def resident_bytes(self):
+        return sum(_nbytes(e.model) for e in self._models.values())
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def model_cache():
+    return ModelCache(max_models=int(os.environ.get(CACHE_ENV) or MAX_MODELS))
+
+
+def get_model(key, directory=ARTIFACT_DIR):
+    """The model of diagnosis module ``key``, loaded on first use and shared process-wide."""
+    return model_cache().get(key, directory)
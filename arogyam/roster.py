@@ -0,0 +1,129 @@
+"""Bulk roster triage: score a whole unit from a CSV or Parquet file.
+
+Rosters are read in chunks so memory stays flat regardless of file size.
+Each chunk is encoded column-wise, scored with one matrix product and its
+per-row zones, alert probability and top risk drivers are appended to the
+output CSV before the next chunk is read.
+
+Rows missing a mandatory answer (the same fields the wizard and
+:func:`arogyam.triage.missing_fields` insist on) are not scored: they get
+zone ``INVALID``, the missing field names in ``missing`` and blank result
+columns, and are counted apart from the triage zones.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from arogyam import metrics
+from arogyam.attribution import risk_sign, top_k
+from arogyam.engine import load_engine
+from arogyam.features import FEATURES, NUMERIC_FIELDS, encode_frame
+from arogyam.rules import ZONE_NAMES, load_ruleset
+from arogyam.triage import MISSING_CHECKS, missing_frame
+
+CHUNK_ROWS = 50_000
+ID_COLUMN = 'subject_id'
+DRIVERS = 3    # top risk-driver columns written per subject
+INVALID = 'INVALID'
+
+# Text columns are read as strings so option labels survive pandas' type inference,
+# and subject IDs (all-digit Army numbers included) are copied through exactly.
+_DTYPES = {name: 'string' for name in (ID_COLUMN, 'sex', 'cp_yn', 'cp_type', 'rad', 'sweat', 'nausea', 'doe',
+                                        'syncope', 'comorb', 'fam_hx', 'per_hx', 'ecg_val', 'trop_val')}
+# Only blanks are missing in text columns: pandas' default NA strings include
+# "None", which is a comorbidity answer.
+_NA_VALUES = {**{name: [''] for name in _DTYPES},
+              **{name: ['', 'NA', 'N/A', 'NaN', 'nan', 'null', 'NULL'] for name in NUMERIC_FIELDS}}
+
+
+def iter_roster(source, chunksize=CHUNK_ROWS):
+    """Yield DataFrame chunks from a ``.csv`` or ``.parquet`` path or file object."""
+    name = getattr(source, 'name', source)
+    if str(name).lower().endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet rosters requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, dtype=_DTYPES, keep_default_na=False, na_values=_NA_VALUES)
+
+
+def triage_matrix(X, engine, ruleset, explain=False):
+    """Zone codes, ML prediction, flag counts, alert probability and contributions for encoded rows.
+
+    The risk-signed contribution matrix is only computed when ``explain`` is
+    set (``None`` otherwise), and then overwrites ``X`` in place.
+    """
+    flags = ruleset.evaluate(X)
+    abnormal, critical = ruleset.counts(flags)
+    if explain:
+        margins, contributions = engine.explain_batch(X, out=X)
+    else:
+        margins, contributions = engine.decision_batch(X), None
+    prediction = engine.classes[(margins > 0).astype(np.intp)]
+    sign = risk_sign(engine)
+    if contributions is not None:
+        contributions *= sign
+    return ruleset.zones(flags, prediction), prediction, abnormal, critical, engine.probability(sign * margins), contributions
+
+
+def triage_frame(df, engine=None, ruleset=None, buffer=None, drivers=DRIVERS):
+    """Score one roster chunk and return the per-row result columns, with its top ``drivers`` feature names."""
+    engine = engine or load_engine()
+    ruleset = ruleset or load_ruleset()
+    missing = missing_frame(df)
+    invalid = missing.any(axis=1)
+    zone, prediction, abnormal, critical, risk, contributions = triage_matrix(
+        encode_frame(df, out=buffer), engine, ruleset, explain=drivers > 0)
+    result = pd.DataFrame({
+        'zone': np.where(invalid, INVALID, ZONE_NAMES[zone]),
+        'ml_prediction': pd.array(prediction, dtype='Int64'),
+        'risk': np.where(invalid, np.nan, risk.round(4)),
+        'n_critical': pd.array(critical, dtype='Int64'),
+        'n_abnormal': pd.array(abnormal, dtype='Int64'),
+    })
+    if drivers:
+        top = top_k(contributions, drivers)
+        top[invalid] = -1
+        for i in range(top.shape[1]):
+            result[f'driver_{i + 1}'] = pd.Categorical.from_codes(top[:, i], FEATURES)
+    result.loc[invalid, ['ml_prediction', 'n_critical', 'n_abnormal']] = pd.NA
+    result['missing'] = ''
+    if invalid.any():
+        names = np.array(MISSING_CHECKS, dtype=object)
+        result.loc[invalid, 'missing'] = [';'.join(names[row]) for row in missing[invalid]]
+    if ID_COLUMN in df:
+        result.insert(0, ID_COLUMN, df[ID_COLUMN].to_numpy())
+    return result
+
+
+def score_roster(source, sink, chunksize=CHUNK_ROWS, engine=None, ruleset=None, drivers=DRIVERS):
+    """Stream ``source`` through the triage pipeline into CSV ``sink``.
+
+    Returns the number of subjects per zone, plus ``INVALID`` rows that
+    were not scored.
+    """
+    engine = engine or load_engine()
+    ruleset = ruleset or load_ruleset()
+    buffer = np.empty((chunksize, len(FEATURES)), dtype=np.float64)
+    counts = dict.fromkeys(ZONE_NAMES.tolist() + [INVALID], 0)
+
+    own = isinstance(sink, (str, os.PathLike))
+    out = open(sink, 'w', newline='') if own else sink
+    try:
+        header = True
+        for chunk in iter_roster(source, chunksize):
+            with metrics.stage('roster_chunk'):
+                result = triage_frame(chunk, engine, ruleset, buffer, drivers)
+            metrics.count('arogyam_roster_rows_total', len(result))
+            result.to_csv(out, header=header, index=False)
+            header = False
+            for zone, n in result['zone'].value_counts().items():
+                counts[zone] += int(n)
+    finally:
+        if own:
+            out.close()
+    return counts
@@ -0,0 +1,180 @@
+"""Table-driven clinical flag rules.
+
+Each rule is plain data::
+
+    {"id": "high_bp", "severity": "abnormal",
+     "any": [["s_bp", ">", 160], ["d_bp", ">", 100]],
+     "name": "High BP ({s_bp}/{d_bp})", "act": "..."}
+
+A rule fires when any of its conditions holds. Conditions compare a
+feature column against a threshold with one of ``>``, ``>=``, ``<``,
+``<=``, ``==``, ``in`` (a list) or ``range`` (``[lo, hi]``, meaning
+``lo < x <= hi``). Categorical thresholds are written as form labels
+("Yes", "ST Elevation") and translated to their encoded values when the
+rule set is compiled.
+
+A :class:`RuleSet` compiles the table once and evaluates it over an
+encoded ``(n, len(FEATURES))`` matrix, so a single subject and a whole
+roster are judged by the same compiled table. ``name`` and ``act`` strings are only
+formatted by :meth:`RuleSet.describe`, for rows that are displayed.
+
+Thresholds can be replaced without code changes by pointing the
+``AROGYAM_RULES`` environment variable (or ``--rules`` on the CLI) at a
+JSON file of the form ``{"rules": [...], "red_min_flags": 3,
+"amber_min_flags": 1}``.
+"""
+import functools
+import json
+import operator
+import os
+
+import numpy as np
+
+from arogyam.features import COL, LABELS
+
+ABNORMAL = "abnormal"
+CRITICAL = "critical"
+
+# Integer zone codes used on encoded matrices, and the zone names they index.
+ZONE_CODE_GREEN, ZONE_CODE_AMBER, ZONE_CODE_RED = 0, 1, 2
+ZONE_NAMES = np.array(["GREEN", "AMBER", "RED"])
+ZONE_GREEN, ZONE_AMBER, ZONE_RED = ZONE_NAMES.tolist()
+# Model label that raises the ML alert (and forces RED).
+ALERT_CLASS = 0
+
+RULES_ENV = 'AROGYAM_RULES'
+
+DEFAULT_RULES = [
+    {"id": "high_bp", "severity": ABNORMAL, "any": [["s_bp", ">", 160], ["d_bp", ">", 100]],
+     "name": "High BP ({s_bp}/{d_bp})", "act": "Monitor closely. Keep subject seated. Do not give stimulants (tea/coffee)."},
+    {"id": "abnormal_pulse", "severity": ABNORMAL, "any": [["pulse", ">", 120], ["pulse", "<", 50]],
+     "name": "Abnormal Pulse ({pulse} BPM)", "act": "Assess for shock or severe dehydration. Hydrate slowly if conscious."},
+    {"id": "hypoxia", "severity": ABNORMAL, "any": [["spo2", "<", 92]],
+     "name": "Hypoxia (SpO2: {spo2}%)", "act": "Administer Supplemental Oxygen via mask. Prepare for descent if at high altitude."},
+    {"id": "tachypnea", "severity": ABNORMAL, "any": [["resp", ">", 25]],
+     "name": "Tachypnea (Resp: {resp}/min)", "act": "Patient is struggling to breathe. Sit them upright. Administer O2."},
+    {"id": "family_history", "severity": ABNORMAL, "any": [["fam_hx", "==", "Yes"]],
+     "name": "Family History of Heart Disease", "act": "Lowers threshold for evacuation. Treat minor symptoms more seriously."},
+    {"id": "personal_history", "severity": ABNORMAL, "any": [["per_hx", "==", "Yes"]],
+     "name": "Previous Heart Issues", "act": "Extremely high risk of recurrence. Subject should not do heavy lifting/patrols."},
+    {"id": "elevated_hb", "severity": ABNORMAL, "any": [["hb_val", "range", [18.0, 19.5]]],
+     "name": "Elevated Hemoglobin ({hb_val} g/dL)", "act": "Blood is thickening. Hydrate heavily. Restrict physical exertion to prevent clotting."},
+    {"id": "critical_hb", "severity": CRITICAL, "any": [["hb_val", ">", 19.5]],
+     "name": "CRITICAL Hemoglobin ({hb_val} g/dL)", "act": "Severe risk of stroke/thrombosis due to blood sludging. Immediate hydration and CAS EVAC."},
+    {"id": "low_hb", "severity": ABNORMAL, "any": [["hb_val", "<", 10.0]],
+     "name": "Low Hemoglobin ({hb_val} g/dL)", "act": "Anemia. Blood cannot carry enough oxygen. Do not deploy to high altitude."},
+    {"id": "nausea", "severity": ABNORMAL, "any": [["nausea", "==", "Yes"]],
+     "name": "Nausea / Vomiting", "act": "Ensure airway is clear. Do not force feed."},
+    {"id": "doe", "severity": ABNORMAL, "any": [["doe", "==", "Yes"]],
+     "name": "Dyspnoea on Exertion", "act": "Strict bed rest. Administer O2. Check for HAPE."},
+    {"id": "chest_pain", "severity": CRITICAL, "any": [["cp_yn", "==", "Yes"]],
+     "name": "Active Chest Pain ({cp_type})", "act": "Assume Heart Attack. Administer 300mg chewable Aspirin immediately (if not allergic). Give O2."},
+    {"id": "radiating_pain", "severity": CRITICAL, "any": [["rad", "==", "Yes"]],
+     "name": "Radiating Pain", "act": "Classic Ischemia. Administer Sorbitrate/Nitroglycerin under tongue if BP > 100."},
+    {"id": "diaphoresis", "severity": CRITICAL, "any": [["sweat", "==", "Yes"]],
+     "name": "Diaphoresis (Cold Sweats)", "act": "Subject is in clinical shock. Elevate legs slightly, keep warm."},
+    {"id": "syncope", "severity": CRITICAL, "any": [["syncope", "==", "Yes"]],
+     "name": "Syncope (Fainting)", "act": "Check pulse and breathing. Be prepared to start CPR."},
+    {"id": "severe_ecg", "severity": CRITICAL, "any": [["ecg_val", "in", ["ST Elevation", "ST Depression", "Pathological Q Waves"]]],
+     "name": "Severe ECG Finding ({ecg_val})", "act": "Confirmed cardiac event. CAS EVAC is mandatory."},
+    {"id": "troponin", "severity": CRITICAL, "any": [["trop_val", "==", "Positive"]],
+     "name": "Troponin T POSITIVE", "act": "Confirmed death of heart muscle cells. Time is tissue. Immediate CAS EVAC."},
+]
+
+_OPS = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '==': operator.eq,
+    'in': lambda x, values: np.isin(x, values),
+    'range': lambda x, bounds: (x > bounds[0]) & (x <= bounds[1]),
+}
+
+# Same comparators on plain floats; a single subject is cheaper to check in
+# Python than through a dozen one-element array ops.
+_SCALAR_OPS = {
+    **_OPS,
+    'in': lambda x, values: x in values,
+    'range': lambda x, bounds: bounds[0] < x <= bounds[1],
+}
+
+
+def _encode_threshold(field, value):
+    labels = LABELS.get(field)
+    if labels is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [labels[v] for v in value]
+    return labels[value]
+
+
+class RuleSet:
+    def __init__(self, rules=DEFAULT_RULES, red_min_flags=3, amber_min_flags=1):
+        self.rules = [dict(rule) for rule in rules]
+        self.red_min_flags = red_min_flags
+        self.amber_min_flags = amber_min_flags
+
+        self._conditions = []
+        for rule in self.rules:
+            if rule['severity'] not in (ABNORMAL, CRITICAL):
+                raise ValueError(f"rule {rule['id']!r}: unknown severity {rule['severity']!r}")
+            compiled = []
+            for field, op, value in rule['any']:
+                if field not in COL:
+                    raise ValueError(f"rule {rule['id']!r}: unknown field {field!r}")
+                if op not in _OPS:
+                    raise ValueError(f"rule {rule['id']!r}: unknown comparator {op!r}")
+                compiled.append((COL[field], op, _encode_threshold(field, value)))
+            self._conditions.append(compiled)
+
+        self.ids = [rule['id'] for rule in self.rules]
+        self.critical = np.array([rule['severity'] == CRITICAL for rule in self.rules])
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec['rules'], spec.get('red_min_flags', 3), spec.get('amber_min_flags', 1))
+
+    def evaluate(self, X):
+        """Boolean ``(n, n_rules)`` matrix of fired rules for encoded rows ``X``."""
+        X = np.atleast_2d(X)
+        if X.shape[0] == 1:
+            row = X[0].tolist()
+            hits = [any(_SCALAR_OPS[op](row[col], value) for col, op, value in conditions)
+                    for conditions in self._conditions]
+            return np.array([hits], dtype=bool)
+
+        flags = np.zeros((X.shape[0], len(self.rules)), dtype=bool)
+        for j, conditions in enumerate(self._conditions):
+            hit = flags[:, j]
+            for col, op, value in conditions:
+                hit |= _OPS[op](X[:, col], value)
+        return flags
+
+    def counts(self, flags):
+        """Abnormal and critical flag counts per row."""
+        critical = flags[:, self.critical].sum(axis=1)
+        abnormal = flags.sum(axis=1) - critical
+        return abnormal, critical
+
+    def zones(self, flags, prediction):
+        """Zone codes (``ZONE_CODE_GREEN``/``ZONE_CODE_AMBER``/``ZONE_CODE_RED``) from fired rules and ML labels."""
+        abnormal, critical = self.counts(flags)
+        total = abnormal + critical
+        red = (critical > 0) | (total >= self.red_min_flags) | (np.asarray(prediction) == ALERT_CLASS)
+        return np.where(red, ZONE_CODE_RED, np.where(total >= self.amber_min_flags, ZONE_CODE_AMBER, ZONE_CODE_GREEN))
+
+    def describe(self, values, row_flags):
+        """``(abnormal_flags, critical_flags)`` as ``{"name", "act"}`` dicts for one displayed row."""
+        abnormal_flags = []
+        critical_flags = []
+        for j in np.flatnonzero(row_flags):
+            rule = self.rules[j]
+            flag = {"name": rule['name'].format_map(values), "act": rule['act']}
+            (critical_flags if self.critical[j] else abnormal_flags).append(flag)
+        return abnormal_flags, critical_flags
+
+
+@functools.lru_cache(maxsize=None)
+def load_ruleset(path=None):
+    """The rule set from ``path``, ``$AROGYAM_RULES`` or the built-in defaults, compiled once."""
+    path = path or os.environ.get(RULES_ENV)
+    return RuleSet.from_json(path) if path else RuleSet()
@@ -0,0 +1,173 @@
+"""Local HTTP scoring endpoint for field-station gateways.
+
+    POST /score    one JSON subject, or a JSON list of subjects
+    GET  /healthz  liveness probe
+    GET  /metrics  stage timings and counters in Prometheus text format
+
+Connections are handed to a fixed pool of worker threads that share one
+resident scoring engine; keep-alive is supported so a gateway can reuse a
+connection for many requests. A connection holds its worker while open, so
+it is closed after ``IDLE_TIMEOUT`` seconds without a request, after
+``MAX_KEEPALIVE_REQUESTS`` requests, and after any response sent while
+other connections are queued for a worker.
+"""
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from arogyam import metrics
+from arogyam.engine import load_engine
+from arogyam.triage import assess_record, assess_records
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+MAX_BODY_BYTES = 4 * 1024 * 1024
+IDLE_TIMEOUT = 5.0              # seconds a keep-alive connection may wait for its next request
+MAX_KEEPALIVE_REQUESTS = 100
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Arogyam'
+    disable_nagle_algorithm = True
+    timeout = IDLE_TIMEOUT
+
+    def setup(self):
+        super().setup()
+        self.served = 0
+
+    def end_headers(self):
+        self.served += 1
+        # Give the worker back rather than idle on it while others wait.
+        if not self.close_connection and (self.served >= MAX_KEEPALIVE_REQUESTS or self.server.queued):
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, max_bytes=MAX_BODY_BYTES):
+        """Request body, or ``None`` after answering 400/413 if its length is invalid or exceeds ``max_bytes``."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            self.close_connection = True
+            return None
+        if length > max_bytes:
+            self._send_json(413, {'error': 'request body too large'})
+            self.close_connection = True
+            return None
+        return self.rfile.read(length)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class TriageHandler(JSONHandler):
+
+    def do_GET(self):
+        if self.path == '/healthz':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', metrics.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': 'not found'})
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        try:
+            payload = json.loads(body)
+            # One engine per request, so a list is scored by a single model version.
+            engine, store = self.server.engine or load_engine(), self.server.store
+            if isinstance(payload, list):
+                result = assess_records(payload, engine, store=store)
+            else:
+                result = assess_record(payload, engine, store=store)
+        except (TypeError, ValueError, AttributeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(200, result)
+
+
+class PooledHTTPServer(HTTPServer):
+    """``HTTPServer`` that dispatches each accepted connection onto a thread pool."""
+
+    def __init__(self, address, handler, workers=DEFAULT_WORKERS, quiet=False, thread_name_prefix='triage'):
+        self.quiet = quiet
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self.queued = 0         # accepted connections waiting for a worker
+        self._active = set()
+        self._queued_lock = threading.Lock()
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        with self._queued_lock:
+            self.queued += 1
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        with self._queued_lock:
+            self.queued -= 1
+            self._active.add(request)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._queued_lock:
+                self._active.discard(request)
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        # Wake workers parked on idle keep-alive connections so exit does not wait out their timeout.
+        with self._queued_lock:
+            active = list(self._active)
+        for request in active:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class TriageServer(PooledHTTPServer):
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), workers=DEFAULT_WORKERS, engine=None, store=None, quiet=False):
+        # Without a fixed engine every request asks the model cache, which picks up hot-swapped versions.
+        self.engine = engine
+        load_engine()
+        self.store = store
+        super().__init__(address, TriageHandler, workers, quiet)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, store=None, quiet=False):
+    with TriageServer((host, port), workers, store=store, quiet=quiet) as server:
+        print(f"AROGYAM scoring endpoint on http://{host}:{server.server_port}/score ({workers} workers)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,256 @@
+"""Persistent assessment store backed by SQLite in WAL mode.
+
+Writes go through a single background writer thread: callers enqueue
+completed assessments and return immediately, and the writer commits
+everything that queued up while the previous commit was running as one
+transaction (group commit). Reads use one connection per thread and are
+served by the ``(subject_id, ts)`` and ``(zone, ts)`` indexes, so subject
+histories and "RED in the last 24h" stay fast at millions of rows.
+
+An assessment recorded with a ``key`` replaces the earlier row with that
+key, so correcting an input and re-running the diagnosis leaves one row
+per assessment. The replacement gets a new row ID, which puts it back in
+the outbox.
+
+The table doubles as the station's outbox: :mod:`arogyam.sync` reads rows
+past a per-target cursor kept in ``sync_state`` and advances it once the
+aggregator has acknowledged them.
+
+A commit that fails on the database (``database is locked`` past the busy
+timeout, a full disk, ...) is retried with backoff and the rows stay
+queued until they are written.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+
+DB_ENV = 'AROGYAM_DB'
+STATION_ENV = 'AROGYAM_STATION'
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'arogyam.db')
+
+BATCH_ROWS = 512
+RETRY_DELAY = 0.5           # first wait after a failed commit, doubling up to MAX_RETRY_DELAY
+MAX_RETRY_DELAY = 30.0
+SHUTDOWN_RETRY_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    subject_id TEXT,
+    station TEXT NOT NULL,
+    ts REAL NOT NULL,
+    zone TEXT NOT NULL,
+    ml_prediction INTEGER NOT NULL,
+    margin REAL NOT NULL,
+    features TEXT NOT NULL,
+    critical_flags TEXT NOT NULL,
+    abnormal_flags TEXT NOT NULL,
+    assessment_key TEXT,
+    label INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_assessments_subject_ts ON assessments (subject_id, ts);
+CREATE INDEX IF NOT EXISTS ix_assessments_zone_ts ON assessments (zone, ts);
+CREATE INDEX IF NOT EXISTS ix_assessments_ts ON assessments (ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    target TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+"""
+
+# Run after SCHEMA; stores created before a column existed get it here.
+MIGRATIONS = [
+    ('assessment_key', 'ALTER TABLE assessments ADD COLUMN assessment_key TEXT'),
+    ('label', 'ALTER TABLE assessments ADD COLUMN label INTEGER'),
+]
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_assessments_key ON assessments (assessment_key);
+"""
+
+# REPLACE deletes the row holding the same assessment_key (NULL keys never
+# collide) and inserts with a fresh id.
+_INSERT = """
+INSERT OR REPLACE INTO assessments
+    (subject_id, station, ts, zone, ml_prediction, margin, features, critical_flags, abnormal_flags, assessment_key)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+log = logging.getLogger(__name__)
+
+
+def default_station():
+    return os.environ.get(STATION_ENV) or socket.gethostname()
+
+
+class AssessmentStore:
+    def __init__(self, path=DEFAULT_DB, station=None, batch_rows=BATCH_ROWS):
+        self.path = path
+        self.station = station or default_station()
+        self.batch_rows = batch_rows
+
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(assessments)')}
+        for column, sql in MIGRATIONS:
+            if column not in columns:
+                conn.execute(sql)
+        conn.executescript(INDEXES)
+        conn.close()
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='arogyam-store', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- writes ---
+    def record(self, assessment, features, subject_id=None, station=None, ts=None, key=None):
+        """Queue one completed :class:`~arogyam.triage.Assessment` for the writer thread.
+
+        ``key`` identifies the assessment: recording it again replaces the earlier row.
+        """
+        self._queue.put((
+            subject_id or None, station or self.station, time.time() if ts is None else ts,
+            assessment.zone, int(assessment.ml_prediction), float(assessment.margin),
+            json.dumps([float(x) for x in features]),
+            json.dumps([f['name'] for f in assessment.critical_flags]),
+            json.dumps([f['name'] for f in assessment.abnormal_flags]),
+            key,
+        ))
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_rows:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not _STOP]
+            stop = len(rows) != len(batch)
+            if rows:
+                # Shutdown may not hang forever on a database that never comes back.
+                self._commit(conn, rows, time.monotonic() + SHUTDOWN_RETRY_SECONDS if stop else None)
+            for _ in batch:
+                self._queue.task_done()
+        conn.close()
+
+    def _commit(self, conn, rows, deadline=None):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                with conn:
+                    conn.executemany(_INSERT, rows)
+                return
+            except sqlite3.OperationalError as e:
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    log.error("Gave up writing %d assessments to %s at shutdown: %s", len(rows), self.path, e)
+                    return
+                log.warning("Could not write %d assessments to %s (%s), retrying in %.1fs", len(rows), self.path, e, delay)
+            except sqlite3.Error:
+                # Not the database but the data: write row by row so only the bad rows are lost.
+                if len(rows) == 1:
+                    log.exception("Dropped an assessment that could not be written to %s: %r", self.path, rows[0])
+                    return
+                for row in rows:
+                    self._commit(conn, [row], deadline)
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def flush(self):
+        """Block until every queued assessment is committed."""
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    # --- reads ---
+    def _rows(self, sql, params):
+        rows = []
+        for row in self._reader().execute(sql, params):
+            row = dict(row)
+            for key in ('features', 'critical_flags', 'abnormal_flags'):
+                row[key] = json.loads(row[key])
+            rows.append(row)
+        return rows
+
+    def history(self, subject_id, limit=100):
+        """Most recent assessments of one subject, newest first."""
+        return self._rows(
+            'SELECT * FROM assessments WHERE subject_id = ? ORDER BY ts DESC LIMIT ?',
+            (subject_id, limit))
+
+    def by_zone(self, zone, since=None, until=None, limit=1000):
+        """Assessments in ``zone`` with ``since <= ts < until``, newest first."""
+        return self._rows(
+            'SELECT * FROM assessments WHERE zone = ? AND ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?',
+            (zone, since or 0.0, until or float('inf'), limit))
+
+    def recent(self, zone, hours=24, limit=1000):
+        return self.by_zone(zone, since=time.time() - hours * 3600, limit=limit)
+
+    # --- outcome labels, for retraining (arogyam.training) ---
+    def set_label(self, assessment_id, label):
+        """Record the confirmed model class of a stored assessment; returns ``False`` if there is no such row."""
+        conn = self._reader()
+        with conn:
+            cursor = conn.execute('UPDATE assessments SET label = ? WHERE id = ?', (label, assessment_id))
+        return cursor.rowcount > 0
+
+    def labelled(self, after_id=0, limit=BATCH_ROWS):
+        """Assessments with a label and ``id > after_id``, oldest first."""
+        return self._rows('SELECT * FROM assessments WHERE label IS NOT NULL AND id > ? ORDER BY id LIMIT ?', (after_id, limit))
+
+    # --- outbox ---
+    def outbox(self, after_id=0, limit=BATCH_ROWS):
+        """Committed assessments with ``id > after_id``, oldest first."""
+        return self._rows('SELECT * FROM assessments WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+
+    def pending(self, target):
+        """Number of assessments not yet acknowledged by ``target``."""
+        return self._reader().execute('SELECT COUNT(*) FROM assessments WHERE id > ?', (self.sync_cursor(target),)).fetchone()[0]
+
+    def sync_cursor(self, target):
+        row = self._reader().execute('SELECT last_id FROM sync_state WHERE target = ?', (target,)).fetchone()
+        return row[0] if row else 0
+
+    def advance_sync_cursor(self, target, last_id):
+        conn = self._reader()
+        with conn:
+            conn.execute(
+                'INSERT INTO sync_state (target, last_id) VALUES (?, ?) '
+                'ON CONFLICT (target) DO UPDATE SET last_id = MAX(last_id, excluded.last_id)',
+                (target, last_id))
+
+
+@functools.lru_cache(maxsize=None)
+def open_store(path=None):
+    """Process-wide store for ``path`` (default ``$AROGYAM_DB`` or ``arogyam.db``)."""
+    store = AssessmentStore(path or os.environ.get(DB_ENV) or DEFAULT_DB)
+    atexit.register(store.close)
+    return store
@@ -0,0 +1,193 @@
+"""Offline-first sync of a station's assessment store to a central aggregator.
+
+The assessment store is the outbox: every completed assessment is already
+committed locally before anything touches the network. A :class:`SyncWorker`
+reads the rows past the cursor it keeps for its aggregator, packs up to
+``batch_rows`` of them into one column-oriented, gzip-compressed JSON batch
+and POSTs it to ``<url>/ingest``. The cursor only moves once the
+aggregator has acknowledged the batch, so an interrupted push is simply
+sent again; the aggregator drops rows it already holds (keyed on
+station, local row ID and timestamp), which makes delivery idempotent.
+
+When the link is down the worker backs off exponentially. When the
+aggregator is saturated it answers 503 with ``Retry-After`` and the worker
+waits that long, so a surge of stations drains at the rate the aggregator
+can absorb while assessments keep accumulating safely on disk.
+"""
+import functools
+import gzip
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+SYNC_ENV = 'AROGYAM_SYNC_URL'
+BATCH_ROWS = 2000
+BATCH_FORMAT = 1
+INTERVAL = 5.0           # seconds between outbox polls once it is drained
+TIMEOUT = 30.0
+MAX_BACKOFF = 300.0
+
+# Wire columns, in order; the ``assessments`` table row with ``id`` sent as ``local_id``.
+COLUMNS = ['local_id', 'subject_id', 'station', 'ts', 'zone', 'ml_prediction', 'margin',
+           'features', 'critical_flags', 'abnormal_flags', 'assessment_key']
+
+log = logging.getLogger(__name__)
+
+
+class SyncError(RuntimeError):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def encode_batch(rows):
+    """Gzip-compressed JSON batch for store rows as returned by ``AssessmentStore.outbox``."""
+    payload = {
+        'format': BATCH_FORMAT,
+        'columns': COLUMNS,
+        'rows': [[row['id']] + [row[c] for c in COLUMNS[1:]] for row in rows],
+    }
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode(), compresslevel=6)
+
+
+def decode_batch(body, max_bytes=None):
+    """Inverse of :func:`encode_batch`; returns a list of dicts keyed by :data:`COLUMNS`."""
+    with gzip.GzipFile(fileobj=io.BytesIO(body)) as f:
+        raw = f.read(-1 if max_bytes is None else max_bytes + 1)
+    if max_bytes is not None and len(raw) > max_bytes:
+        raise ValueError("batch expands beyond the size limit")
+    payload = json.loads(raw)
+    if payload.get('format') != BATCH_FORMAT:
+        raise ValueError(f"unsupported batch format {payload.get('format')!r}")
+    columns = payload['columns']
+    return [dict(zip(columns, row)) for row in payload['rows']]
+
+
+class SyncWorker:
+    """Background thread that drains an :class:`~arogyam.store.AssessmentStore` to ``url``."""
+
+    def __init__(self, store, url, batch_rows=BATCH_ROWS, interval=INTERVAL, timeout=TIMEOUT, max_backoff=MAX_BACKOFF):
+        self.store = store
+        self.url = url.rstrip('/')
+        parts = urlsplit(self.url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"sync URL must be http(s)://host[:port][/path], got {url!r}")
+        self._parts = parts
+        self.batch_rows = batch_rows
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.duplicates = 0
+        self.last_error = None
+
+    # --- one push ---
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self._parts.scheme == 'https' else http.client.HTTPConnection
+            self._conn = cls(self._parts.hostname, self._parts.port, timeout=self.timeout)
+        return self._conn
+
+    def _post(self, body):
+        try:
+            conn = self._connection()
+            conn.request('POST', f"{self._parts.path}/ingest", body=body, headers={
+                'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self._close()
+            raise
+        if response.status == 200:
+            return json.loads(data)
+        retry_after = response.getheader('Retry-After')
+        raise SyncError(f"aggregator answered {response.status}: {data[:200]!r}", response.status,
+                        float(retry_after) if retry_after else None)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def push(self):
+        """Send one batch from the outbox; returns the number of rows acknowledged (0 when drained)."""
+        rows = self.store.outbox(self.store.sync_cursor(self.url), self.batch_rows)
+        if not rows:
+            return 0
+        try:
+            ack = self._post(encode_batch(rows))
+        except SyncError as e:
+            if e.status == 413 and self.batch_rows > 1:
+                self.batch_rows //= 2
+            raise
+        self.store.advance_sync_cursor(self.url, rows[-1]['id'])
+        self.sent += ack.get('accepted', 0)
+        self.duplicates += ack.get('duplicates', 0)
+        return len(rows)
+
+    def sync(self):
+        """Push batches until the outbox is drained; returns the number of rows acknowledged.
+
+        The connection is reused across the batches of one drain and closed
+        afterwards, so an idle station never holds an aggregator worker.
+        """
+        total = 0
+        try:
+            while True:
+                n = self.push()
+                total += n
+                if n < self.batch_rows:
+                    return total
+        finally:
+            self._close()
+
+    # --- background loop ---
+    def run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.last_error = None
+                backoff = 1.0
+                wait = self.interval
+            except (OSError, http.client.HTTPException, SyncError, ValueError) as e:
+                self.last_error = str(e)
+                retry_after = getattr(e, 'retry_after', None)
+                wait = retry_after if retry_after is not None else backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.max_backoff)
+                log.warning("Sync to %s failed (%s), retrying in %.1fs", self.url, e, wait)
+            self._stop.wait(wait)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='arogyam-sync', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self):
+        return {'url': self.url, 'pending': self.store.pending(self.url), 'sent': self.sent,
+                'duplicates': self.duplicates, 'last_error': self.last_error}
+
+
+@functools.lru_cache(maxsize=None)
+def start_sync(store, url=None):
+    """Process-wide sync worker for ``store``, or ``None`` when no URL is configured (``$AROGYAM_SYNC_URL``)."""
+    url = url or os.environ.get(SYNC_ENV)
+    if not url:
+        return None
+    return SyncWorker(store, url).start()
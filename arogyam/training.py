@@ -0,0 +1,261 @@
+"""Incremental retraining of the heart model from labelled assessment records.
+
+Records are streamed in chunks so memory stays flat at millions of rows.
+They come from CSV or Parquet files (the roster layout plus a label column
+holding the model class) and/or from the station's assessment store, whose
+rows carry the encoded features of every completed assessment and get a
+label once the subject's outcome is confirmed
+(:meth:`~arogyam.store.AssessmentStore.set_label`, ``arogyam label``). :class:`IncrementalTrainer` starts from the deployed model and, for
+each chunk:
+
+1. merges the chunk into running scaler statistics (Chan et al.'s
+   parallel mean/variance update, as ``StandardScaler.partial_fit``), and
+   re-expresses the coefficients in the new scaling so the model's
+   decision function is unchanged by the statistics moving;
+2. takes mini-batch SGD steps on the L2-regularised logistic loss, as
+   ``SGDClassifier(loss='log_loss').partial_fit`` would.
+
+A reservoir of rows is held out from training (or a separate hold-out file
+is used) and the candidate is only promoted when it is no worse than the
+deployed model on it in log loss, accuracy and recall of the alert class
+(an alert forces ZONE RED, so a model that misses more of them must not
+ship even if its probabilities are better calibrated). Promotion writes the runtime model file atomically
+(keeping the previous file next to it for rollback); running workers
+pick the new version up through :mod:`arogyam.registry`.
+"""
+import itertools
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from arogyam.engine import ARTIFACT_DIR, RUNTIME_FILE, ScoringEngine, read_engine
+from arogyam.features import encode_frame
+from arogyam.roster import CHUNK_ROWS, iter_roster
+from arogyam.rules import ALERT_CLASS
+from arogyam.triage import missing_frame
+
+LABEL_COLUMN = 'label'
+BATCH_ROWS = 256
+LEARNING_RATE = 0.01
+ALPHA = 1e-4                 # L2 penalty per sample
+PRIOR_SAMPLES = 10_000       # weight of the deployed scaler statistics against new rows
+HOLDOUT_FRACTION = 0.1
+HOLDOUT_ROWS = 200_000       # reservoir cap: 200k x 20 float64 = 32 MB
+MAX_LOSS_INCREASE = 0.0      # promote only if hold-out log loss does not get worse than this,
+MAX_ACCURACY_DROP = 0.0      # accuracy does not fall by more than this
+MAX_RECALL_DROP = 0.0        # and alert-class recall does not fall by more than this
+
+
+class IncrementalTrainer:
+    def __init__(self, engine, prior_samples=PRIOR_SAMPLES, learning_rate=LEARNING_RATE, alpha=ALPHA,
+                 batch_rows=BATCH_ROWS, seed=0):
+        self.base = engine
+        self.classes = engine.classes
+        self.features = engine.features
+        self.coef = engine.coef.copy()
+        self.intercept = engine.intercept
+        self.n = float(prior_samples)
+        self.mean = engine.mean.copy()
+        self.m2 = engine.scale ** 2 * self.n
+        self.learning_rate = learning_rate
+        self.alpha = alpha
+        self.batch_rows = batch_rows
+        self.steps = 0
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def scale(self):
+        scale = np.sqrt(self.m2 / self.n)
+        return np.where(scale == 0, 1.0, scale)
+
+    def _update_scaler(self, X):
+        # Raw-space weights before the statistics move, to re-express them after.
+        w, b = self.coef / self.scale, self.intercept - (self.coef / self.scale) @ self.mean
+        n_b = X.shape[0]
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        delta = mean_b - self.mean
+        total = self.n + n_b
+        self.mean = self.mean + delta * (n_b / total)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * n_b / total)
+        self.n = total
+        self.coef = w * self.scale
+        self.intercept = float(b + w @ self.mean)
+
+    def partial_fit(self, X, y):
+        """Update the scaler statistics and the model with one chunk of encoded rows and class labels."""
+        X = np.asarray(X, dtype=np.float64)
+        t = (np.asarray(y) == self.classes[1]).astype(np.float64)
+        if X.shape[0] == 0:
+            return self
+        self._update_scaler(X)
+        Z = (X - self.mean) / self.scale
+        order = self._rng.permutation(X.shape[0])
+        for start in range(0, len(order), self.batch_rows):
+            idx = order[start:start + self.batch_rows]
+            z, target = Z[idx], t[idx]
+            p = ScoringEngine.probability(z @ self.coef + self.intercept)
+            err = p - target
+            eta = self.learning_rate / np.sqrt(1.0 + self.steps / 1000.0)
+            self.coef -= eta * (z.T @ err / len(idx) + self.alpha * self.coef)
+            self.intercept -= eta * float(err.mean())
+            self.steps += 1
+        self.rows_seen += X.shape[0]
+        return self
+
+    def engine(self, version=None):
+        return ScoringEngine(self.coef, self.intercept, self.mean, self.scale, self.classes, self.features, version)
+
+
+class Holdout:
+    """Fixed-size uniform reservoir of ``(X, y)`` rows diverted from training."""
+
+    def __init__(self, max_rows=HOLDOUT_ROWS, n_features=20, seed=1):
+        self.X = np.empty((max_rows, n_features))
+        self.y = np.empty(max_rows, dtype=np.int64)
+        self.size = 0
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, X, y):
+        """Offer rows to the reservoir; returns the ``(X, y)`` rows it did not keep."""
+        cap = len(self.y)
+        fill = min(cap - self.size, len(y))
+        self.X[self.size:self.size + fill] = X[:fill]
+        self.y[self.size:self.size + fill] = y[:fill]
+        self.size += fill
+        self.seen += fill
+        X, y = X[fill:], y[fill:]
+        if len(y):
+            # Algorithm R, vectorised: row i of the stream replaces a random slot with probability cap / (i + 1).
+            slot = self._rng.integers(0, self.seen + np.arange(1, len(y) + 1))
+            keep = slot < cap
+            self.X[slot[keep]] = X[keep]
+            self.y[slot[keep]] = y[keep]
+            self.seen += len(y)
+            return X[~keep], y[~keep]
+        return X, y
+
+    def arrays(self):
+        return self.X[:self.size], self.y[:self.size]
+
+
+def evaluate(engine, X, y):
+    """Hold-out accuracy, :data:`ALERT_CLASS` recall and mean log loss of ``engine``."""
+    margins = engine.decision_batch(X)
+    p = np.clip(engine.probability(margins), 1e-15, 1 - 1e-15)
+    y = np.asarray(y)
+    t = y == engine.classes[1]
+    alert = y == ALERT_CLASS
+    predicted_alert = (margins > 0) == (engine.classes[1] == ALERT_CLASS)
+    return {
+        'rows': int(len(t)),
+        'alert_rows': int(alert.sum()),
+        'accuracy': float(np.mean((margins > 0) == t)) if len(t) else float('nan'),
+        'alert_recall': float(np.mean(predicted_alert[alert])) if alert.any() else float('nan'),
+        'log_loss': float(-np.mean(np.where(t, np.log(p), np.log1p(-p)))) if len(t) else float('nan'),
+    }
+
+
+def gate(base, candidate, max_loss_increase=MAX_LOSS_INCREASE, max_accuracy_drop=MAX_ACCURACY_DROP,
+         max_recall_drop=MAX_RECALL_DROP):
+    """Which promotion checks ``candidate`` passes against ``base`` (both :func:`evaluate` reports)."""
+    return {
+        'log_loss': candidate['log_loss'] <= base['log_loss'] + max_loss_increase,
+        'accuracy': candidate['accuracy'] >= base['accuracy'] - max_accuracy_drop,
+        # A hold-out without alert rows cannot show a recall regression.
+        'alert_recall': base['alert_rows'] == 0 or candidate['alert_recall'] >= base['alert_recall'] - max_recall_drop,
+    }
+
+
+def _labelled_chunks(sources, label_column, chunksize):
+    for source in sources:
+        for chunk in iter_roster(source, chunksize):
+            labels = pd.to_numeric(chunk[label_column], errors='coerce')
+            # Unlabelled rows and rows with unanswered mandatory fields are not trained on.
+            keep = labels.notna().to_numpy(dtype=bool) & ~missing_frame(chunk).any(axis=1)
+            if keep.any():
+                yield encode_frame(chunk[keep]), labels[keep].to_numpy(dtype=np.int64)
+
+
+def _store_chunks(store, n_features, chunksize):
+    store.flush()
+    after = 0
+    while True:
+        rows = store.labelled(after, chunksize)
+        if not rows:
+            return
+        after = rows[-1]['id']
+        X = np.array([row['features'] for row in rows], dtype=np.float64)
+        if X.shape[1] != n_features:
+            raise ValueError(f"stored assessments have {X.shape[1]} features, the model expects {n_features}")
+        yield X, np.array([row['label'] for row in rows], dtype=np.int64)
+
+
+def retrain(sources, directory=ARTIFACT_DIR, holdout=None, label_column=LABEL_COLUMN, chunksize=CHUNK_ROWS,
+            holdout_fraction=HOLDOUT_FRACTION, max_loss_increase=MAX_LOSS_INCREASE,
+            max_accuracy_drop=MAX_ACCURACY_DROP, max_recall_drop=MAX_RECALL_DROP, dry_run=False, seed=0, store=None):
+    """Update the deployed model with labelled ``sources`` (and ``store``) and promote it if it validates.
+
+    ``holdout`` is a labelled file to validate on; without one a random
+    ``holdout_fraction`` of the streamed rows is diverted into a bounded
+    reservoir instead. The candidate must pass every :func:`gate` check.
+    Returns a report dict.
+    """
+    base = read_engine(directory)
+    trainer = IncrementalTrainer(base, seed=seed)
+    reservoir = None if holdout else Holdout(n_features=base.n_features, seed=seed + 1)
+    rng = np.random.default_rng(seed + 2)
+    t0 = time.perf_counter()
+    chunks = _labelled_chunks(sources, label_column, chunksize)
+    if store is not None:
+        chunks = itertools.chain(chunks, _store_chunks(store, base.n_features, chunksize))
+    for X, y in chunks:
+        if reservoir is not None:
+            held = rng.random(len(y)) < holdout_fraction
+            # Once the reservoir is full, rows it turns down are trained on instead of wasted.
+            X_rest, y_rest = reservoir.add(X[held], y[held])
+            X, y = np.concatenate([X[~held], X_rest]), np.concatenate([y[~held], y_rest])
+        trainer.partial_fit(X, y)
+    train_seconds = time.perf_counter() - t0
+
+    if holdout:
+        parts = list(_labelled_chunks([holdout], label_column, chunksize))
+        X_val = np.concatenate([X for X, _ in parts]) if parts else np.empty((0, base.n_features))
+        y_val = np.concatenate([y for _, y in parts]) if parts else np.empty(0, dtype=np.int64)
+    else:
+        X_val, y_val = reservoir.arrays()
+
+    candidate = trainer.engine(version=f"{time.strftime('%Y%m%dT%H%M%S')}-incr")
+    candidate.self_check()
+    report = {
+        'rows_trained': trainer.rows_seen,
+        'train_seconds': round(train_seconds, 3),
+        'base_version': base.version,
+        'candidate_version': candidate.version,
+        'base': evaluate(base, X_val, y_val),
+        'candidate': evaluate(candidate, X_val, y_val),
+    }
+    report['checks'] = gate(report['base'], report['candidate'], max_loss_increase, max_accuracy_drop, max_recall_drop)
+    ok = trainer.rows_seen > 0 and len(y_val) > 0 and all(report['checks'].values())
+    report['promoted'] = bool(ok and not dry_run)
+    if report['promoted']:
+        report['path'] = promote(candidate, directory)
+    return report
+
+
+def promote(engine, directory=ARTIFACT_DIR):
+    """Atomically replace the runtime model in ``directory``, keeping the previous file for rollback."""
+    path = os.path.join(directory, RUNTIME_FILE)
+    if os.path.exists(path):
+        previous = read_engine(directory)
+        stem, ext = os.path.splitext(path)
+        shutil.copy2(path, f"{stem}.{previous.version}{ext}")
+    engine.to_file(path)
+    # Round-trip through the file so what ships is what was verified.
+    ScoringEngine.from_file(path).self_check()
+    return path
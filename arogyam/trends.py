@@ -0,0 +1,241 @@
+"""Serial reassessment: per-subject vital-sign trends and deterioration alerts.
+
+Each subject keeps a small ring of the most recent raw readings plus a
+ring of daily buckets that older readings are folded into, so memory per
+subject is fixed no matter how many weeks they are followed. The window
+statistics (per-vital least-squares slope over the raw ring and the delta
+from the previous reading) are maintained with running sums updated in
+O(1) as readings enter and leave the ring.
+
+Trend thresholds are data, in the same spirit as :mod:`arogyam.rules`,
+and fire independently of the single-reading zone: a subject can be
+GREEN on every individual check and still be deteriorating.
+"""
+import functools
+import operator
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from arogyam.features import COL
+
+VITALS = ['s_bp', 'd_bp', 'pulse', 'resp', 'spo2', 'hb_val']
+V = {name: i for i, name in enumerate(VITALS)}
+
+WINDOW = 8                # raw readings kept per subject
+ARCHIVE_BUCKETS = 60      # downsampled buckets kept per subject
+BUCKET_SECONDS = 24 * 3600
+MAX_SUBJECTS = 5_000      # subjects kept in memory before the least recently seen is dropped
+MIN_SLOPE_POINTS = 3
+MIN_SLOPE_HOURS = 1.0
+
+TREND_RULES = [
+    {"id": "spo2_falling", "stat": "slope", "field": "spo2", "op": "<=", "threshold": -0.5,
+     "name": "SpO2 falling ({value:+.2f} %/h)", "act": "Progressive hypoxia. Administer O2 and reassess within 1 hour. Prepare for descent."},
+    {"id": "spo2_drop", "stat": "delta", "field": "spo2", "op": "<=", "threshold": -4,
+     "name": "SpO2 dropped {value:+.0f}% since last reading", "act": "Recheck probe placement, then administer O2. Reassess within 1 hour."},
+    {"id": "pulse_rise", "stat": "delta", "field": "pulse", "op": ">=", "threshold": 20,
+     "name": "Pulse up {value:+.0f} BPM since last reading", "act": "Rising heart strain. Rest the subject and reassess within 1 hour."},
+    {"id": "resp_rise", "stat": "delta", "field": "resp", "op": ">=", "threshold": 6,
+     "name": "Resp rate up {value:+.0f}/min since last reading", "act": "Developing respiratory distress. Check for HAPE. Sit upright, administer O2."},
+    {"id": "sbp_fall", "stat": "delta", "field": "s_bp", "op": "<=", "threshold": -30,
+     "name": "Systolic BP down {value:+.0f} since last reading", "act": "Possible shock. Lay subject flat, elevate legs and consult MO."},
+    {"id": "hb_rising", "stat": "slope", "field": "hb_val", "op": ">=", "threshold": 0.05,
+     "name": "Hemoglobin rising ({value:+.3f} g/dL/h)", "act": "Blood is thickening over time. Hydrate heavily and restrict exertion."},
+]
+
+_OPS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+
+class SubjectSeries:
+    """Fixed-size vital-sign history for one subject."""
+
+    __slots__ = ('t0', 'times', 'values', 'head', 'size', 'last', 'previous', 'key', 'sums',
+                 'archive_times', 'archive_sums', 'archive_counts', 'archive_head', 'archive_size')
+
+    def __init__(self, t0, window=WINDOW, buckets=ARCHIVE_BUCKETS):
+        n = len(VITALS)
+        self.t0 = t0
+        self.times = np.zeros(window)              # hours since t0
+        self.values = np.full((window, n), np.nan)
+        self.head = 0
+        self.size = 0
+        self.last = np.full(n, np.nan)
+        self.previous = self.last     # ``last`` before the newest reading, for replace()
+        self.key = None               # assessment that produced the newest reading
+        # Running n, Σt, Σy, Σt², Σty per vital over the raw window.
+        self.sums = np.zeros((5, n))
+        self.archive_times = np.zeros(buckets)      # bucket start, epoch seconds
+        self.archive_sums = np.zeros((buckets, n))
+        self.archive_counts = np.zeros((buckets, n))
+        self.archive_head = -1
+        self.archive_size = 0
+
+    def _accumulate(self, t, y, sign):
+        ok = ~np.isnan(y)
+        y = np.where(ok, y, 0.0)
+        w = sign * ok
+        self.sums += w * np.array([np.ones_like(y), np.full_like(y, t), y, np.full_like(y, t * t), t * y])
+
+    def _archive(self, t_hours, y):
+        ts = self.t0 + t_hours * 3600
+        bucket = ts - ts % BUCKET_SECONDS
+        if self.archive_size == 0 or self.archive_times[self.archive_head] != bucket:
+            self.archive_head = (self.archive_head + 1) % len(self.archive_times)
+            self.archive_size = min(self.archive_size + 1, len(self.archive_times))
+            self.archive_times[self.archive_head] = bucket
+            self.archive_sums[self.archive_head] = 0
+            self.archive_counts[self.archive_head] = 0
+        ok = ~np.isnan(y)
+        self.archive_sums[self.archive_head, ok] += y[ok]
+        self.archive_counts[self.archive_head, ok] += 1
+
+    def add(self, ts, y):
+        """Append a reading (epoch seconds, vitals in ``VITALS`` order, NaN = not measured).
+
+        Returns ``(delta, slope)``: change from the previous reading per vital
+        and the per-hour least-squares slope over the raw window.
+        """
+        t = (ts - self.t0) / 3600.0
+        if self.size == len(self.times):
+            old_t, old_y = self.times[self.head], self.values[self.head].copy()
+            self._accumulate(old_t, old_y, -1)
+            self._archive(old_t, old_y)
+        else:
+            self.size += 1
+        self.times[self.head] = t
+        self.values[self.head] = y
+        self.head = (self.head + 1) % len(self.times)
+        self._accumulate(t, y, +1)
+
+        self.previous = self.last
+        delta = y - self.previous
+        self.last = np.where(np.isnan(y), self.previous, y)
+        return delta, self.slope()
+
+    def replace(self, ts, y):
+        """Overwrite the newest reading with a corrected one; returns ``(delta, slope)`` as :meth:`add`."""
+        if self.size == 0:
+            return self.add(ts, y)
+        i = (self.head - 1) % len(self.times)
+        self._accumulate(self.times[i], self.values[i], -1)
+        t = (ts - self.t0) / 3600.0
+        self.times[i] = t
+        self.values[i] = y
+        self._accumulate(t, y, +1)
+
+        delta = y - self.previous
+        self.last = np.where(np.isnan(y), self.previous, y)
+        return delta, self.slope()
+
+    def slope(self):
+        n, st, sy, stt, sty = self.sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denom = n * stt - st * st
+            slope = (n * sty - st * sy) / denom
+        span = self.span_hours()
+        return np.where((n >= MIN_SLOPE_POINTS) & (span >= MIN_SLOPE_HOURS) & (denom > 0), slope, np.nan)
+
+    def span_hours(self):
+        if self.size < 2:
+            return 0.0
+        newest = self.times[(self.head - 1) % len(self.times)]
+        oldest = self.times[self.head % len(self.times)] if self.size == len(self.times) else self.times[0]
+        return newest - oldest
+
+    def daily_means(self):
+        """``(bucket_start, means)`` for the downsampled history, oldest first."""
+        order = [(self.archive_head - i) % len(self.archive_times) for i in range(self.archive_size)][::-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.archive_sums[order] / self.archive_counts[order]
+        return self.archive_times[order], means
+
+
+def check_trends(delta, slope, rules=TREND_RULES):
+    """Deterioration alerts as ``{"name", "act"}`` dicts for one subject's latest statistics."""
+    stats = {'delta': delta, 'slope': slope}
+    alerts = []
+    for rule in rules:
+        value = stats[rule['stat']][V[rule['field']]]
+        if not np.isnan(value) and _OPS[rule['op']](value, rule['threshold']):
+            alerts.append({"name": rule['name'].format(value=value), "act": rule['act']})
+    return alerts
+
+
+def vitals_from(values, hb_measured=True):
+    """Vitals vector from a form mapping; Hb is NaN unless a test was actually done."""
+    y = np.array([values[k] for k in VITALS], dtype=np.float64)
+    if not hb_measured:
+        y[V['hb_val']] = np.nan
+    return y
+
+
+class TrendTracker:
+    """Process-wide map of subject ID -> :class:`SubjectSeries`, bounded to ``max_subjects``.
+
+    ``loader(subject_id)`` may return earlier ``(ts, vitals)`` readings,
+    oldest first, to warm a subject that is not in memory yet.
+    """
+
+    def __init__(self, loader=None, max_subjects=MAX_SUBJECTS, rules=TREND_RULES):
+        self.loader = loader
+        self.max_subjects = max_subjects
+        self.rules = rules
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, subject_id, ts):
+        series = self._series.get(subject_id)
+        if series is not None:
+            self._series.move_to_end(subject_id)
+            return series
+        earlier = self.loader(subject_id) if self.loader else []
+        series = SubjectSeries(earlier[0][0] if earlier else ts)
+        for t, y in earlier:
+            series.add(t, y)
+        self._series[subject_id] = series
+        while len(self._series) > self.max_subjects:
+            self._series.popitem(last=False)
+        return series
+
+    def update(self, subject_id, ts, vitals, key=None):
+        """Add a reading and return ``{"delta", "slope", "alerts"}`` for it.
+
+        A reading with the same ``key`` as the subject's newest one is a
+        correction of that assessment and replaces it instead.
+        """
+        with self._lock:
+            series = self._get(subject_id, ts)
+            if key is not None and series.key == key:
+                delta, slope = series.replace(ts, vitals)
+            else:
+                delta, slope = series.add(ts, vitals)
+                series.key = key
+        return {"delta": dict(zip(VITALS, delta.tolist())),
+                "slope": dict(zip(VITALS, slope.tolist())),
+                "alerts": check_trends(delta, slope, self.rules)}
+
+
+def store_loader(store, limit=WINDOW):
+    """Loader that warms a subject from the most recent rows in an :class:`~arogyam.store.AssessmentStore`.
+
+    The store does not keep whether Hb was measured, so warmed readings carry no Hb.
+    """
+    cols = [COL[name] for name in VITALS]
+
+    def load(subject_id):
+        store.flush()
+        rows = store.history(subject_id, limit=limit)[::-1]
+        readings = []
+        for row in rows:
+            y = np.array([row['features'][c] for c in cols], dtype=np.float64)
+            y[V['hb_val']] = np.nan
+            readings.append((row['ts'], y))
+        return readings
+    return load
+
+
+@functools.lru_cache(maxsize=None)
+def get_tracker(store=None):
+    return TrendTracker(loader=store_loader(store) if store is not None else None)
@@ -0,0 +1,137 @@
+"""Streamlit-free triage: encode a subject, apply the clinical rule set and pick a zone.
+
+``values`` is any mapping with the wizard's field names (``st.session_state``
+in the app, a decoded JSON object in the CLI and HTTP server).
+"""
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from arogyam import metrics
+from arogyam.attribution import TOP_K, drivers, risk_terms
+from arogyam.features import ECG_DEFAULT, HB_DEFAULT
+from arogyam.registry import MODULES, get_model
+from arogyam.rules import ZONE_AMBER, ZONE_GREEN, ZONE_NAMES, ZONE_RED
+
+REQUIRED_FIELDS = ['age', 'sex', 's_bp', 'd_bp', 'pulse', 'resp', 'spo2',
+                   'cp_yn', 'rad', 'sweat', 'nausea', 'doe', 'syncope',
+                   'comorb', 'fam_hx', 'per_hx', 'trop_val']
+
+
+@dataclass
+class Assessment:
+    zone: str
+    ml_prediction: int
+    margin: float
+    critical_flags: list = field(default_factory=list)
+    abnormal_flags: list = field(default_factory=list)
+    risk: float = None                           # model probability of the alert class
+    drivers: list = field(default_factory=list)  # top features by contribution, see arogyam.attribution
+    model_version: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def missing_fields(values):
+    """Mandatory fields that are absent or unanswered, in form order."""
+    missing = [k for k in REQUIRED_FIELDS if values.get(k) is None]
+    if values.get('cp_yn') == "Yes" and values.get('cp_type') is None:
+        missing.append('cp_type')
+    return missing
+
+
+MISSING_CHECKS = REQUIRED_FIELDS + ['cp_type']
+
+
+def missing_frame(df):
+    """Column-wise equivalent of :func:`missing_fields` for a pandas DataFrame.
+
+    Returns an ``(len(df), len(MISSING_CHECKS))`` boolean matrix. A file
+    without one of the :data:`REQUIRED_FIELDS` columns at all is a schema
+    error rather than a row problem: ``ValueError`` names the absent columns.
+    """
+    absent = [name for name in REQUIRED_FIELDS if name not in df]
+    if absent:
+        raise ValueError(f"roster is missing required columns: {', '.join(absent)}")
+    mask = np.empty((len(df), len(MISSING_CHECKS)), dtype=bool)
+    for j, name in enumerate(REQUIRED_FIELDS):
+        mask[:, j] = df[name].isna().to_numpy(dtype=bool)
+    chest_pain = df['cp_yn'].eq("Yes").fillna(False).to_numpy(dtype=bool)
+    cp_type = df['cp_type'].isna().to_numpy(dtype=bool) if 'cp_type' in df else True
+    mask[:, -1] = chest_pain & cp_type
+    return mask
+
+
+def normalize(values):
+    """Apply the defaults the wizard uses when optional diagnostics are unavailable."""
+    values = dict(values)
+    if values.get('ecg_val') is None:
+        values['ecg_val'] = ECG_DEFAULT
+    if values.get('hb_val') is None:
+        values['hb_val'] = HB_DEFAULT
+    values.setdefault('cp_type', None)
+    return values
+
+
+def assess(values, engine=None, ruleset=None, top_k=TOP_K, module=None):
+    """Run the full page-4 triage for one subject, with its ``top_k`` risk drivers.
+
+    ``module`` is the :class:`~arogyam.registry.DiagnosisModule` whose
+    encoder, rule set and model are used (default: heart).
+    """
+    module = module or MODULES['heart']
+    engine = engine or get_model(module.key)
+    ruleset = ruleset or module.load_rules()
+    with metrics.stage('encode'):
+        features = np.asarray(module.encode(values), dtype=np.float64)
+    with metrics.stage('score'):
+        margin, contributions = engine.explain(features)
+        ml_prediction = int(engine.classes[int(margin > 0)])
+    with metrics.stage('rules'):
+        flags = ruleset.evaluate(features)
+        zone = str(ZONE_NAMES[ruleset.zones(flags, ml_prediction)[0]])
+        abnormal_flags, critical_flags = ruleset.describe(values, flags[0])
+    risk, contributions = risk_terms(engine, margin, contributions)
+    return Assessment(zone, ml_prediction, margin, critical_flags, abnormal_flags,
+                      float(risk), drivers(contributions, values, top_k, module.features), engine.version)
+
+
+def assess_record(record, engine=None, ruleset=None, store=None, module=None):
+    """Validate and assess one decoded JSON record, returning a JSON-ready dict.
+
+    Raises ``ValueError`` naming any missing mandatory fields. When a
+    ``store`` is given the assessment is also queued for persistence.
+    """
+    return assess_records([record], engine, ruleset, store, module)[0]
+
+
+def assess_records(records, engine=None, ruleset=None, store=None, module=None):
+    """All-or-nothing :func:`assess_record` for a list of records.
+
+    Every record is validated and scored before any is counted or stored,
+    so a request rejected for one bad record leaves nothing behind and can
+    be retried without duplicating rows.
+    """
+    module = module or MODULES['heart']
+    scored = []
+    for i, record in enumerate(records):
+        where = f"record {i}: " if len(records) > 1 else ""
+        if not isinstance(record, dict):
+            raise TypeError(f"{where}expected a JSON object")
+        missing = missing_fields(record)
+        if missing:
+            raise ValueError(f"{where}missing mandatory fields: {', '.join(missing)}")
+        values = normalize(record)
+        scored.append((record, values, assess(values, engine, ruleset, module=module)))
+
+    results = []
+    for record, values, assessment in scored:
+        metrics.count('arogyam_assessments_total', zone=assessment.zone)
+        if store is not None:
+            store.record(assessment, module.encode(values), subject_id=record.get('subject_id'), station=record.get('station'))
+        result = assessment.to_dict()
+        if 'subject_id' in record:
+            result = {'subject_id': record['subject_id'], **result}
+        results.append(result)
+    return results
@@ -0,0 +1,333 @@
+"""Offline benchmark suite for AROGYAM.
+
+    python benchmarks/run.py --out bench.json
+    python benchmarks/run.py --out bench.json --compare baseline.json
+
+Three groups of measurements:
+
+* ``app``: drives ``app.py`` headlessly with Streamlit's ``AppTest``
+  through login and the four-page wizard, recording p50/p95/p99 wall
+  time of every page transition plus single-widget edits on pages 1-2,
+  and the bytes of ForwardMsgs each step sends to the browser.
+* ``cold_start``: fresh-interpreter time to import the app's modules
+  and load the model, from the runtime ``.npz`` and from the sklearn
+  pickles, and which heavy libraries each path imported.
+* ``scoring``: microbenchmarks of artifact loading, feature encoding,
+  the sklearn ``scaler.transform`` + ``model.predict`` path, the fused
+  engine, the rule set and full triage, for single rows and 1k/100k
+  batches.
+
+Results are written as JSON tagged with the git commit so runs from
+different commits can be compared with ``--compare``.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arogyam.engine import MODEL_FILE, SCALER_FILE, ScoringEngine  # noqa: E402
+from arogyam.features import encode, encode_frame  # noqa: E402
+from arogyam.rules import load_ruleset  # noqa: E402
+from arogyam.triage import assess  # noqa: E402
+
+SUBJECT = {
+    'subject_id': '', 'age': 45, 'sex': "Male", 's_bp': 150, 'd_bp': 95, 'pulse': 96, 'resp': 20, 'spo2': 91,
+    'cp_yn': "Yes", 'cp_type': "Heavy", 'rad': "No", 'sweat': "No", 'nausea': "No", 'doe': "Yes", 'syncope': "No",
+    'comorb': "Hypertension", 'fam_hx': "Yes", 'per_hx': "No", 'ecg_val': "Normal", 'hb_val': 17.5, 'trop_val': "Negative",
+}
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds."""
+    ms = np.asarray(samples) * 1e3
+    return {'n': int(ms.size), 'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99))}
+
+
+def timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def random_roster(n, seed=0):
+    rng = np.random.default_rng(seed)
+    pick = lambda options: rng.choice(np.array(options, dtype=object), n)
+    return pd.DataFrame({
+        'age': rng.integers(18, 90, n), 'sex': pick(["Male", "Female"]),
+        's_bp': rng.integers(90, 200, n), 'd_bp': rng.integers(50, 120, n), 'pulse': rng.integers(45, 140, n),
+        'resp': rng.integers(10, 30, n), 'spo2': rng.integers(80, 101, n),
+        'cp_yn': pick(["No", "Yes"]), 'cp_type': pick(["Tight", "Heavy", "Crushing"]),
+        'rad': pick(["No", "Yes"]), 'sweat': pick(["No", "Yes"]), 'nausea': pick(["No", "Yes"]),
+        'doe': pick(["No", "Yes"]), 'syncope': pick(["No", "Yes"]),
+        'comorb': pick(["None", "Hypertension", "Diabetes", "Dyslipidemia"]),
+        'fam_hx': pick(["No", "Yes"]), 'per_hx': pick(["No", "Yes"]),
+        'ecg_val': pick(["Normal", "ST Elevation", "LBBB"]), 'hb_val': np.round(rng.uniform(8, 21, n), 1),
+        'trop_val': pick(["Negative", "Positive"]),
+    })
+
+
+# --- SCORING MICROBENCHMARKS ---
+def bench_scoring(repeat):
+    results = {}
+
+    def load_pickles():
+        with open(os.path.join(ROOT, MODEL_FILE), 'rb') as f:
+            model = pickle.load(f)
+        with open(os.path.join(ROOT, SCALER_FILE), 'rb') as f:
+            scaler = pickle.load(f)
+        return model, scaler
+
+    # The first load also pays for importing sklearn; later ones are warm.
+    results['pickle_load_first'] = summarize(timeit(load_pickles, 1))
+    results['pickle_load'] = summarize(timeit(load_pickles, max(3, repeat // 100)))
+    model, scaler = load_pickles()
+    results['engine_build'] = summarize(timeit(lambda: ScoringEngine.from_sklearn(model, scaler), max(3, repeat // 100)))
+    engine = ScoringEngine.from_sklearn(model, scaler)
+    ruleset = load_ruleset()
+
+    features = encode(SUBJECT)
+    row = np.asarray([features], dtype=np.float64)
+    results['single/encode'] = summarize(timeit(lambda: encode(SUBJECT), repeat))
+    results['single/sklearn_predict'] = summarize(timeit(lambda: model.predict(scaler.transform([features])), max(10, repeat // 10)))
+    results['single/fused_predict'] = summarize(timeit(lambda: engine.predict(features), repeat))
+    results['single/rules'] = summarize(timeit(lambda: ruleset.evaluate(row), repeat))
+    results['single/assess'] = summarize(timeit(lambda: assess(SUBJECT, engine, ruleset), repeat))
+
+    for n in (1_000, 100_000):
+        df = random_roster(n)
+        X = encode_frame(df)
+        reps = max(3, repeat // (n // 100))
+        batch = {
+            'encode': summarize(timeit(lambda: encode_frame(df), reps)),
+            'sklearn_predict': summarize(timeit(lambda: model.predict(scaler.transform(X)), reps)),
+            'fused_predict': summarize(timeit(lambda: engine.predict_batch(X), reps)),
+            'rules': summarize(timeit(lambda: ruleset.evaluate(X), reps)),
+        }
+        total_ms = batch['encode']['p50_ms'] + batch['fused_predict']['p50_ms'] + batch['rules']['p50_ms']
+        batch['rows_per_sec'] = n / (total_ms / 1e3)
+        results[f'batch_{n}'] = batch
+    return results
+
+
+# --- COLD START ---
+HEAVY_MODULES = ['sklearn', 'scipy', 'pandas', 'pyarrow']
+
+COLD_START = {
+    'engine_from_runtime_file': "from arogyam.engine import load_engine; load_engine()",
+    'engine_from_pickles': "from arogyam.engine import load_pickled_engine; load_pickled_engine()",
+    'app_imports': ("import streamlit, streamlit_option_menu, arogyam.engine, arogyam.features, "
+                    "arogyam.store, arogyam.trends, arogyam.triage"),
+    'app_imports_and_engine': ("import streamlit, streamlit_option_menu, arogyam.engine, arogyam.features, "
+                               "arogyam.store, arogyam.trends, arogyam.triage; arogyam.engine.load_engine()"),
+}
+
+_COLD_PROBE = """
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+t = time.perf_counter()
+{stmt}
+seconds = time.perf_counter() - t
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def bench_cold_start(repeat):
+    """Fresh-interpreter wall time for each entry of ``COLD_START`` and the heavy modules it pulled in."""
+    results = {}
+    for name, stmt in COLD_START.items():
+        samples, heavy = [], []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, '-c', _COLD_PROBE.format(stmt=stmt, heavy=HEAVY_MODULES)],
+                                  cwd=ROOT, capture_output=True, text=True, check=True)
+            probe = json.loads(proc.stdout.strip().splitlines()[-1])
+            samples.append(probe['seconds'])
+            heavy = probe['heavy']
+        results[name] = {**summarize(samples), 'heavy_modules': heavy}
+    return results
+
+
+# --- APP PAGE-TRANSITION BENCHMARKS ---
+def _radio(at, label):
+    return next(r for r in at.radio if r.label == label)
+
+
+def _number(at, label):
+    return next(n for n in at.number_input if n.label == label)
+
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+class _Payload:
+    """Records the size of every ForwardMsg the script runs enqueue.
+
+    AppTest always reruns the whole script, so for a widget edit the bytes
+    of deltas tagged with a fragment ID are what a real session would send
+    for a fragment-scoped rerun.
+    """
+
+    def __init__(self):
+        self.msgs = []
+
+    def __enter__(self):
+        from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+        self._cls, self._enqueue = ForwardMsgQueue, ForwardMsgQueue.enqueue
+        payload = self
+
+        def enqueue(queue, msg):
+            payload.msgs.append((msg.ByteSize(), bool(msg.HasField('delta') and msg.delta.fragment_id)))
+            return payload._enqueue(queue, msg)
+        ForwardMsgQueue.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        self._cls.enqueue = self._enqueue
+
+    def take(self):
+        full = sum(size for size, _ in self.msgs)
+        fragment = sum(size for size, in_fragment in self.msgs if in_fragment)
+        self.msgs.clear()
+        return full, fragment
+
+
+def _walk(at, timings, payload=None, sizes=None):
+    def step(name, widget):
+        if payload is not None:
+            payload.take()
+        t = time.perf_counter()
+        widget.run()
+        timings.setdefault(name, []).append(time.perf_counter() - t)
+        if payload is not None:
+            full, fragment = payload.take()
+            # Only widget edits can be fragment-scoped; navigation reruns the app.
+            sent = fragment if fragment and name.endswith('_edit') else full
+            sizes[name] = {'full_rerun_bytes': full, 'sent_bytes': sent, 'full_rerun': sent == full}
+
+    t = time.perf_counter()
+    at.run()
+    timings.setdefault('cold_login_page', []).append(time.perf_counter() - t)
+
+    at.text_input[0].input("admin")
+    at.text_input[1].input("admin")
+    step('login->page1', _button(at, "ACCESS SYSTEM").click())
+    step('page1_widget_edit', _number(at, "Age *").set_value(SUBJECT['age']))
+    _radio(at, "Sex *").set_value(SUBJECT['sex'])
+    step('page1->page2', _button(at, "NEXT PAGE").click())
+    # Answering chest pain enables the pain-type selectbox, so it costs a rerun of its own.
+    step('page2_widget_edit', _radio(at, "Chest Pain Present? *").set_value(SUBJECT['cp_yn']))
+    at.selectbox[0].set_value(SUBJECT['cp_type'])
+    for label, key in [("Radiation of Pain *", 'rad'), ("Sweating (Diaphoresis) *", 'sweat'), ("Nausea / Vomiting *", 'nausea'),
+                       ("Dyspnoea on Exertion (DOE) *", 'doe'), ("Syncope (Fainting) *", 'syncope')]:
+        _radio(at, label).set_value(SUBJECT[key])
+    step('page2->page3', _button(at, "NEXT PAGE").click())
+    at.selectbox[0].set_value(SUBJECT['comorb'])
+    for label, key in [("Family History of CVD *", 'fam_hx'), ("Personal History of CVD *", 'per_hx'), ("Troponin T (Rapid Kit) *", 'trop_val')]:
+        _radio(at, label).set_value(SUBJECT[key])
+    step('page3->page4', _button(at, "RUN DIAGNOSIS").click())
+    if at.exception:
+        raise RuntimeError(f"app raised during benchmark: {at.exception[0].value}")
+    if at.session_state['page_step'] != 4:
+        raise RuntimeError("benchmark flow did not reach page 4")
+    step('page4->new_assessment', _button(at, "NEW ASSESSMENT").click())
+
+
+def bench_app(iterations):
+    from streamlit.testing.v1 import AppTest
+
+    timings, sizes = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['AROGYAM_DB'] = os.path.join(tmp, 'bench.db')
+        with _Payload() as payload:
+            _walk(AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=120), {}, payload, sizes)
+        for _ in range(iterations):
+            at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=120)
+            _walk(at, timings)
+    results = {name: summarize(samples) for name, samples in timings.items()}
+    results['payload'] = {
+        'steps': sizes,
+        'bytes_per_assessment': sum(s['sent_bytes'] for s in sizes.values()),
+        'full_reruns_per_assessment': sum(s['full_rerun'] for s in sizes.values()),
+    }
+    return results
+
+
+# --- REPORTING ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(tree, prefix=''):
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def compare(current, baseline):
+    base = dict(_flatten(baseline['results']))
+    print(f"{'metric':55s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for key, value in _flatten(current['results']):
+        if not key.endswith(('p50_ms', 'rows_per_sec', '_per_assessment')) or key not in base:
+            continue
+        change = (value - base[key]) / base[key] * 100 if base[key] else float('nan')
+        print(f"{key:55s} {base[key]:12.3f} {value:12.3f} {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default='bench.json', help="where to write the JSON results")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    parser.add_argument('--repeat', type=int, default=2000, help="repetitions for single-row microbenchmarks")
+    parser.add_argument('--cold-repeat', type=int, default=5, help="fresh interpreters per cold-start measurement")
+    parser.add_argument('--app-iterations', type=int, default=20, help="full wizard walks through AppTest")
+    parser.add_argument('--skip-app', action='store_true', help="only run the scoring microbenchmarks")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore')
+    results = {'cold_start': bench_cold_start(args.cold_repeat), 'scoring': bench_scoring(args.repeat)}
+    if not args.skip_app:
+        results['app'] = bench_app(args.app_iterations)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())